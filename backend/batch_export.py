@@ -0,0 +1,157 @@
+"""
+batch_export.py
+─────────────────────────────────────────────────────────────────────
+Streaming exports of many certificates as one download.
+
+  stream_zip(sources)         → ZIP of cert_<id>.pdf entries (stored, not
+                                recompressed), written as each PDF arrives
+  stream_merged_pdf(sources)  → one multi-page PDF
+
+sources yields one chunk of (cert_id, pdf, error) at a time, where pdf
+is a file path or PDF bytes, or None when error says why it is missing.
+The caller produces the chunks (reusing rendered
+PDFs, rendering the missing ones), so only one chunk is held at a time.
+
+The ZIP is written to a write-only sink and drained after every entry,
+so at most one PDF of it is held in memory. The merged PDF is built in a temporary
+file: each chunk of pages is appended as an incremental update and the
+bytes that update added are sent before the next chunk is read. Failed
+certificates are listed in errors.txt inside the ZIP, and on trailing
+"Omitted certificates" pages of a merged PDF. An export without a
+single certificate raises NothingToExport before any byte is produced.
+
+Configuration (environment):
+  EXPORT_CHUNK_SIZE   certificates loaded and rendered per chunk (default: 200)
+"""
+
+import os
+import tempfile
+import zipfile
+
+import fitz  # PyMuPDF
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "200"))
+
+STREAM_BLOCK_SIZE = 1024 * 1024
+OMITTED_LINES_PER_PAGE = 60
+
+
+class NothingToExport(Exception):
+    """No certificate of the export could be included; errors lists why, per certificate."""
+
+    def __init__(self, errors: list):
+        super().__init__(f"none of {len(errors)} certificate(s) could be exported")
+        self.errors = errors
+
+
+class _Sink:
+    """Write-only file object collecting what ZipFile writes until it is drained."""
+
+    def __init__(self):
+        self._parts: list = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def stream_zip(sources):
+    """Yield the bytes of a ZIP archive with one PDF per certificate."""
+    sink = _Sink()
+    errors = []
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as zf:
+        for chunk in sources:
+            for cert_id, pdf, error in chunk:
+                if pdf is None:
+                    errors.append((cert_id, error))
+                    continue
+                with zf.open(f"cert_{cert_id}.pdf", "w", force_zip64=True) as entry:
+                    if isinstance(pdf, bytes):
+                        entry.write(pdf)
+                    else:
+                        with open(pdf, "rb") as f:
+                            for block in iter(lambda: f.read(STREAM_BLOCK_SIZE), b""):
+                                entry.write(block)
+                # Header, data and descriptor of one entry go out together
+                yield sink.drain()
+        if not zf.filelist:
+            raise NothingToExport(errors)
+        if errors:
+            zf.writestr("errors.txt", "".join(f"{cert_id}: {error}\n" for cert_id, error in errors))
+    yield sink.drain()
+
+
+def _open_pdf(pdf):
+    if isinstance(pdf, bytes):
+        return fitz.open(stream=pdf, filetype="pdf")
+    return fitz.open(pdf)
+
+
+def _add_omitted_pages(doc, errors: list):
+    """Append pages listing the certificates left out of a merged PDF."""
+    lines = [f"{cert_id}: {str(error)[:150]}" for cert_id, error in errors]
+    for start in range(0, len(lines), OMITTED_LINES_PER_PAGE):
+        page = doc.new_page(width=595, height=842)
+        page.insert_text((40, 50), f"Omitted certificates ({len(lines)})", fontsize=14)
+        for n, line in enumerate(lines[start:start + OMITTED_LINES_PER_PAGE]):
+            page.insert_text((40, 80 + n * 12), line, fontsize=8)
+
+
+def stream_merged_pdf(sources):
+    """Yield the bytes of one PDF holding every certificate's pages, in order."""
+    fd, path = tempfile.mkstemp(prefix="educerts_export_", suffix=".pdf")
+    os.close(fd)
+    sent = 0
+    started = False
+    errors = []  # (cert_id, error) of certificates left out
+
+    def appended():
+        nonlocal sent
+        with open(path, "rb") as f:
+            f.seek(sent)
+            for block in iter(lambda: f.read(STREAM_BLOCK_SIZE), b""):
+                sent += len(block)
+                yield block
+
+    try:
+        for chunk in sources:
+            # The first chunk creates the file; later ones reopen it, which only
+            # reads its xref, and append their pages as an incremental update
+            doc = fitz.open(path) if started else fitz.open()
+            try:
+                for cert_id, pdf, error in chunk:
+                    if pdf is None:
+                        errors.append((cert_id, error))
+                        continue
+                    try:
+                        with _open_pdf(pdf) as src:
+                            doc.insert_pdf(src)
+                    except Exception as e:
+                        errors.append((cert_id, e))
+                if started:
+                    doc.saveIncr()
+                elif doc.page_count:
+                    doc.save(path)
+                    started = True
+            finally:
+                doc.close()
+            yield from appended()
+
+        if not started:
+            raise NothingToExport(errors)
+        if errors:
+            print(f"EXPORT: {len(errors)} certificate(s) left out of the merged PDF")
+            with fitz.open(path) as doc:
+                _add_omitted_pages(doc, errors)
+                doc.saveIncr()
+            yield from appended()
+    finally:
+        os.remove(path)
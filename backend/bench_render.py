@@ -0,0 +1,95 @@
+"""
+Benchmark: filling AcroForm templates with 5, 50 and 200 form fields.
+
+Compares the per-occurrence widget scan that render_pdf_certificate used
+to do (every occurrence walks all of page.widgets()) with the name index
+in pdf_utils._fill_document, and checks that both fill the same values.
+
+Run from backend/:  python bench_render.py [renders per template]
+The baseline is quadratic (about 30 s per certificate at 200 fields), so it
+is timed over a single render. Templates and output go to a temporary directory.
+"""
+import os
+import sys
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+
+import pdf_utils
+
+FIELD_COUNTS = (5, 50, 200)
+
+
+def make_form_template(path: str, field_count: int):
+    """One A4 page with `field_count` text widgets laid out in a grid."""
+    doc = fitz.open()
+    page = doc.new_page(width=595, height=842)
+    columns = 4
+    for i in range(field_count):
+        x0 = 20 + (i % columns) * 140
+        y0 = 20 + (i // columns) * 15
+        widget = fitz.Widget()
+        widget.field_type = fitz.PDF_WIDGET_TYPE_TEXT
+        widget.field_name = f"field_{i}"
+        widget.rect = fitz.Rect(x0, y0, x0 + 130, y0 + 13)
+        widget.text_fontsize = 8
+        page.add_widget(widget)
+    doc.save(path)
+    doc.close()
+
+
+def fill_by_scan(doc, placeholder_map: dict, field_values: dict):
+    """The previous AcroForm loop, kept here as the baseline."""
+    for field_name, occurrences in placeholder_map.items():
+        value = field_values.get(field_name, "")
+        for occ in occurrences:
+            page = doc[occ["page"]]
+            for widget in page.widgets():
+                if widget.field_name == field_name:
+                    widget.field_value = str(value)
+                    widget.update()
+
+
+def fill_by_index(doc, placeholder_map: dict, field_values: dict):
+    pdf_utils._fill_document(doc, placeholder_map, field_values, {})
+
+
+def time_fill(fill, template_bytes: bytes, placeholder_map: dict, field_values: dict,
+              renders: int, out_path: str) -> float:
+    t0 = time.perf_counter()
+    for _ in range(renders):
+        doc = fitz.open(stream=template_bytes, filetype="pdf")
+        fill(doc, placeholder_map, field_values)
+        doc.save(out_path)
+        doc.close()
+    return time.perf_counter() - t0
+
+
+def filled_values(path: str) -> dict:
+    with fitz.open(path) as doc:
+        return {w.field_name: w.field_value for page in doc for w in page.widgets()}
+
+
+def main_bench(renders: int):
+    tmp_dir = tempfile.mkdtemp(prefix="educerts_bench_")
+    print(f"{renders} indexed renders per template")
+    for field_count in FIELD_COUNTS:
+        template_path = os.path.join(tmp_dir, f"form_{field_count}.pdf")
+        make_form_template(template_path, field_count)
+        placeholder_map, template_bytes = pdf_utils.load_template(template_path)
+        field_values = {f"field_{i}": f"Value {i}" for i in range(field_count)}
+
+        scan_out = os.path.join(tmp_dir, f"scan_{field_count}.pdf")
+        index_out = os.path.join(tmp_dir, f"index_{field_count}.pdf")
+        scan_ms = time_fill(fill_by_scan, template_bytes, placeholder_map, field_values, 1, scan_out) * 1000
+        index_ms = time_fill(fill_by_index, template_bytes, placeholder_map, field_values,
+                             renders, index_out) / renders * 1000
+        assert filled_values(scan_out) == filled_values(index_out) == field_values
+
+        print(f"  {field_count:3d} fields: scan {scan_ms:9.2f} ms/cert   index {index_ms:8.2f} ms/cert"
+              f"   ({scan_ms / index_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main_bench(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,108 @@
+"""
+Benchmark: size and time of signed certificate PDFs per save profile.
+
+Builds a two-page template whose signature and stamp placeholders appear
+several times, then renders and signs it:
+  before   each image occurrence embedded separately, plain save
+  <name>   images embedded once per document, saved with SAVE_PROFILES[name]
+
+Run from backend/:  python bench_save.py [certificates per profile]
+Templates and output are written to a temporary directory.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+
+import pdf_utils
+
+
+def make_template(path: str):
+    doc = fitz.open()
+    for page_no in range(2):
+        page = doc.new_page(width=842, height=595)
+        page.insert_text((60, 80), "Certificate of Completion", fontsize=28)
+        page.insert_text((60, 160), "{{student_name}}", fontsize=20)
+        page.insert_text((60, 200), "{{course_name}}", fontsize=16)
+        page.insert_text((60, 480), "{{digital_signature}}", fontsize=24)
+        page.insert_text((480, 480), "{{stamp}}", fontsize=24)
+        if page_no == 0:
+            page.insert_text((60, 540), "{{digital_signature}}", fontsize=14)
+    doc.save(path)
+    doc.close()
+
+
+def make_image(path: str, width: int, height: int, seed: int):
+    """A noisy RGB image, so it does not compress away to nothing."""
+    rng = random.Random(seed)
+    samples = bytes(rng.randrange(180, 256) for _ in range(width * height * 3))
+    fitz.Pixmap(fitz.csRGB, width, height, samples, False).save(path)
+
+
+def sign_separately(pdf_path: str, placeholder_map: dict, images: dict, output_path: str):
+    """The previous signing loop: every occurrence embeds its own copy of the image."""
+    doc = fitz.open(pdf_path)
+    for field_name, occurrences in placeholder_map.items():
+        image = images.get(field_name)
+        if not image:
+            continue
+        for occ in occurrences:
+            page = doc[occ["page"]]
+            rect = fitz.Rect(occ["rect"])
+            page.draw_rect(rect, color=(1, 1, 1), fill=(1, 1, 1), overlay=True)
+            page.insert_image(rect, stream=image)
+    doc.save(output_path)
+    doc.close()
+
+
+def run(label: str, count: int, tmp_dir: str, template_bytes: bytes, placeholder_map: dict,
+        images: dict, profile: str | None):
+    out_dir = os.path.join(tmp_dir, label)
+    os.makedirs(out_dir)
+    t0 = time.perf_counter()
+    for i in range(count):
+        field_values = {"student_name": f"Student {i}", "course_name": "Benchmarking 101"}
+        base_path = os.path.join(out_dir, f"{i}_base.pdf")
+        signed_path = os.path.join(out_dir, f"{i}_signed.pdf")
+        if profile is None:
+            doc = fitz.open(stream=template_bytes, filetype="pdf")
+            pdf_utils._fill_document(doc, placeholder_map, field_values, {})
+            doc.save(base_path)
+            doc.close()
+            sign_separately(base_path, placeholder_map, images, signed_path)
+        else:
+            pdf_utils.PDF_SAVE_PROFILE = profile
+            pdf_utils.render_loaded(template_bytes, placeholder_map, field_values, base_path, {})
+            pdf_utils.apply_images(base_path, placeholder_map, images, signed_path)
+    elapsed = time.perf_counter() - t0
+    signed_sizes = [os.path.getsize(os.path.join(out_dir, f"{i}_signed.pdf")) for i in range(count)]
+    with fitz.open(os.path.join(out_dir, "0_signed.pdf")) as doc:
+        embedded = len({img[0] for page in doc for img in page.get_images(full=True)})
+    return elapsed / count * 1000, sum(signed_sizes) / count / 1024, embedded
+
+
+def main_bench(count: int):
+    tmp_dir = tempfile.mkdtemp(prefix="educerts_bench_")
+    template_path = os.path.join(tmp_dir, "template.pdf")
+    sig_path = os.path.join(tmp_dir, "signature.png")
+    stamp_path = os.path.join(tmp_dir, "stamp.png")
+    make_template(template_path)
+    make_image(sig_path, 300, 100, seed=1)
+    make_image(stamp_path, 160, 160, seed=2)
+    placeholder_map, template_bytes = pdf_utils.load_template(template_path)
+    images = pdf_utils.load_images(sig_path, stamp_path)
+
+    print(f"{count} certificates per profile (render + sign)")
+    baseline = None
+    for label, profile in [("before", None)] + [(name, name) for name in pdf_utils.SAVE_PROFILES]:
+        ms, kib, embedded = run(label, count, tmp_dir, template_bytes, placeholder_map, images, profile)
+        baseline = baseline or kib
+        print(f"  {label:8s} {ms:7.2f} ms/cert   signed PDF {kib:8.1f} KiB ({kib / baseline:5.1%})"
+              f"   images embedded: {embedded}")
+
+
+if __name__ == "__main__":
+    main_bench(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
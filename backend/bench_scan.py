@@ -0,0 +1,95 @@
+"""
+Benchmark: placeholder scanning of multi-page, text-heavy templates.
+
+Compares the previous text-layer scanner (per-character index list,
+string concatenation, regex over every page) with
+pdf_utils.extract_pdf_placeholders on generated transcript-like
+templates, and checks that both find the same placeholders.
+
+Run from backend/:  python bench_scan.py [scans per template]
+Templates are written to a temporary directory.
+"""
+import os
+import sys
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+
+import pdf_utils
+
+# (pages, text lines per page)
+TEMPLATES = ((1, 40), (10, 60), (40, 80))
+
+
+def make_transcript(path: str, pages: int, lines: int):
+    """Pages of course rows; placeholders only on the first and last page."""
+    doc = fitz.open()
+    for page_no in range(pages):
+        page = doc.new_page(width=595, height=842)
+        if page_no == 0:
+            page.insert_text((40, 40), "Academic Transcript of {{student_name}} ({{ student_id }})", fontsize=10)
+            page.insert_text((40, 55), "Programme: {{course_name}}   Issued: {{issued_at}}", fontsize=10)
+        for line in range(lines):
+            course = page_no * lines + line
+            page.insert_text((40, 75 + line * 9.5),
+                             f"CS{course:04d}  Advanced Topics in Subject Area {course % 17}  "
+                             f"Credits 5  Grade A-  Semester {course % 8 + 1}  Passed with distinction",
+                             fontsize=7)
+        if page_no == pages - 1:
+            page.insert_text((40, 800), "{{digital_signature}}          {{stamp}}", fontsize=12)
+    doc.save(path)
+    doc.close()
+
+
+def scan_previous(pdf_path: str) -> dict:
+    """The previous text-layer pass, kept here as the baseline (widgets omitted: none here)."""
+    result: dict = {}
+    doc = fitz.open(pdf_path)
+    for page_idx, page in enumerate(doc):
+        words = page.get_text("words")
+        if words:
+            full_text = ""
+            index_map = []
+            for w in words:
+                word_str = w[4]
+                for _ in range(len(word_str)):
+                    index_map.append(w)
+                full_text += word_str + " "
+                index_map.append(None)
+            for match in pdf_utils.PLACEHOLDER_RE.finditer(full_text):
+                start, end = match.start(), match.end()
+                participating = [index_map[k] for k in range(start, end) if index_map[k] is not None]
+                if participating:
+                    result.setdefault(match.group(1), []).append({
+                        "type": "text_overlay", "page": page_idx,
+                        "rect": (min(w[0] for w in participating), min(w[1] for w in participating),
+                                 max(w[2] for w in participating), max(w[3] for w in participating)),
+                    })
+    doc.close()
+    return result
+
+
+def time_scan(scan, path: str, scans: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(scans):
+        scan(path)
+    return (time.perf_counter() - t0) / scans * 1000
+
+
+def main_bench(scans: int):
+    tmp_dir = tempfile.mkdtemp(prefix="educerts_bench_")
+    print(f"{scans} scans per template")
+    for pages, lines in TEMPLATES:
+        path = os.path.join(tmp_dir, f"transcript_{pages}.pdf")
+        make_transcript(path, pages, lines)
+        assert scan_previous(path) == pdf_utils.extract_pdf_placeholders(path)
+
+        before_ms = time_scan(scan_previous, path, scans)
+        after_ms = time_scan(pdf_utils.extract_pdf_placeholders, path, scans)
+        print(f"  {pages:3d} pages x {lines} lines: before {before_ms:8.2f} ms   after {after_ms:8.2f} ms"
+              f"   ({before_ms / after_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main_bench(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,63 @@
+"""
+Benchmark: /api/verify called in a loop vs a single /api/verify/batch call.
+
+Run from backend/:  python bench_verify.py [count]
+Uses a throwaway SQLite database, so the configured database is never touched.
+"""
+import os
+import sys
+import tempfile
+import time
+
+tmp_dir = tempfile.mkdtemp(prefix="educerts_bench_")
+os.environ["DATABASE_URL"] = f"sqlite:///{tmp_dir}/bench.db"
+
+from fastapi.testclient import TestClient
+
+import bulk_issue
+import crypto_utils
+import database
+import main
+
+
+def issue(count: int) -> list:
+    entries = []
+    for i in range(count):
+        entries.append({
+            "student_name": f"Student {i}", "course_name": "Benchmarking 101",
+            "cert_type": "certificate", "organization": "EduCerts Academy", "fields": {},
+            "raw_data": {"id": f"{i:08d}", "type": "certificate", "name": "Benchmarking 101",
+                         "recipient": {"name": f"Student {i}", "studentId": str(i)}},
+        })
+    db = database.SessionLocal()
+    try:
+        issued, _ = bulk_issue.issue_batch(db, entries, use_pdf=False, pdf_template_path="")
+        db.commit()
+    finally:
+        db.close()
+    return [c["id"] for c in issued]
+
+
+def main_bench(count: int):
+    with TestClient(main.app) as client:
+        ids = issue(count)
+
+        crypto_utils._verified_roots.clear()
+        t0 = time.perf_counter()
+        for cert_id in ids:
+            assert client.post("/api/verify", json={"certificate_id": cert_id}).json()["summary"]["all"]
+        loop_s = time.perf_counter() - t0
+
+        crypto_utils._verified_roots.clear()
+        t0 = time.perf_counter()
+        res = client.post("/api/verify/batch", json={"certificate_ids": ids}).json()
+        batch_s = time.perf_counter() - t0
+        assert res["summary"]["valid"] == count
+
+    print(f"{count} certificates")
+    print(f"  /api/verify loop : {loop_s:8.3f}s  {count / loop_s:10.1f} docs/s")
+    print(f"  /api/verify/batch: {batch_s:8.3f}s  {count / batch_s:10.1f} docs/s  ({loop_s / batch_s:.1f}x)")
+
+
+if __name__ == "__main__":
+    main_bench(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
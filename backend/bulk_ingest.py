@@ -0,0 +1,95 @@
+"""
+bulk_ingest.py
+─────────────────────────────────────────────────────────────────────
+Streaming reader for bulk issuance uploads (CSV and Excel).
+
+  spool_upload(file)      → copies the upload to a temporary file on disk,
+                            block by block
+  open_rows(path, kind)   → (headers, rows) where rows yields one dict per
+                            data row, read lazily:
+                              .csv  through an incremental UTF-8 decoder
+                              .xlsx through openpyxl's read-only mode
+  chunked(rows, size)     → lists of at most `size` rows
+
+Nothing holds the whole file or all of its rows, so memory stays flat
+no matter how many rows an upload has.
+
+Configuration (environment):
+  BULK_CHUNK_SIZE   rows issued per batch (default: 1000)
+  BULK_SPOOL_DIR    directory for spooled uploads (default: system temp dir)
+"""
+
+import csv
+import io
+import itertools
+import os
+import tempfile
+from contextlib import contextmanager
+
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+BULK_SPOOL_DIR = os.getenv("BULK_SPOOL_DIR") or None
+
+SPOOL_BLOCK_SIZE = 1024 * 1024
+
+
+async def spool_upload(file, suffix: str) -> str:
+    """Write an UploadFile to a temporary file and return its path. The caller removes it."""
+    fd, path = tempfile.mkstemp(prefix="educerts_upload_", suffix=suffix, dir=BULK_SPOOL_DIR)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                block = await file.read(SPOOL_BLOCK_SIZE)
+                if not block:
+                    break
+                out.write(block)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def _xlsx_cell(value) -> str:
+    return str(value).strip() if value is not None else ""
+
+
+@contextmanager
+def open_rows(path: str, kind: str):
+    """
+    Open a spooled upload ("csv" or "xlsx") and yield (headers, rows).
+    rows is a lazy iterator of {header: value} dicts; it is only valid
+    inside the with block.
+    """
+    if kind == "xlsx":
+        import openpyxl
+        wb = openpyxl.load_workbook(path, read_only=True)
+        try:
+            sheet_rows = wb.active.iter_rows(values_only=True)
+            first = next(sheet_rows, None) or ()
+            headers = [_xlsx_cell(v) for v in first]
+
+            def rows():
+                for values in sheet_rows:
+                    # Read-only sheets can report formatted but empty rows
+                    if all(v is None for v in values):
+                        continue
+                    yield {h: _xlsx_cell(v) for h, v in zip(headers, values)}
+
+            yield headers, rows()
+        finally:
+            wb.close()
+    else:
+        with open(path, "rb") as raw:
+            text = io.TextIOWrapper(raw, encoding="utf-8", errors="ignore", newline="")
+            reader = csv.DictReader(text)
+            headers = list(reader.fieldnames or [])
+            yield headers, reader
+
+
+def chunked(rows, size: int):
+    """Group an iterator of rows into lists of at most `size` rows."""
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, max(size, 1)))
+        if not chunk:
+            return
+        yield chunk
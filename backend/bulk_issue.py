@@ -0,0 +1,244 @@
+"""
+bulk_issue.py
+─────────────────────────────────────────────────────────────────────
+Batch issuance pipeline shared by the bulk endpoints and background bulk jobs.
+
+Every row is wrapped as its own OA document, but the documents of one
+upload are anchored together:
+  • each document's targetHash becomes a leaf of one batch Merkle tree
+  • signature.proof carries that document's sibling path
+  • the batch root is signed once and stored as a single
+    DocumentRegistry entry with the real cert_count
+
+Rows belonging to different organizations are anchored as separate
+batches, since a registry entry records a single organization.
+
+Certificates are written with Core executemany INSERTs of
+CERT_INSERT_CHUNK_SIZE rows (default: 500) rather than one ORM object each.
+PDFs are rendered through render_pool, a batch at a time, with the field
+values /api/download uses (certificate_fields); the layout manifest records
+their hash, so downloads serve the issuance render while it still matches
+the template. When a signer
+is named at issuance, the signature and stamp are placed in the same pass
+and only the signed PDF is written; its thumbnail is then generated in
+the background (unsigned certificates are previewed from the render cache).
+"""
+
+import datetime
+import os
+import uuid
+
+from sqlalchemy import insert
+
+import bulk_ingest
+import certificate_fields
+import claim_codes
+import crypto_utils
+import models
+import oa_logic
+import pdf_utils
+import render_cache
+import render_pool
+import thumbnails
+import worker_pool
+
+CERT_INSERT_CHUNK_SIZE = int(os.getenv("CERT_INSERT_CHUNK_SIZE", "500"))
+
+
+def make_issuers(organization: str) -> list:
+    """OpenCerts issuer block for documents issued by EduCerts."""
+    return [{"name": organization, "url": "https://educerts.io",
+             "documentStore": "0x007d40224f6562461633ccfbaffd359ebb2fc9ba",
+             "identityProof": {"type": "DNS-TXT", "location": "educerts.io"}}]
+
+
+def _insert_certificates(db, rows: list):
+    """
+    One executemany INSERT for a chunk of certificate rows. Core-level, so no
+    ORM object or identity map entry is created per certificate.
+    """
+    if rows:
+        db.execute(insert(models.Certificate.__table__), rows)
+
+
+def signer_from_record(record: models.DigitalSignatureRecord) -> dict:
+    """The signer passed to issue_batch / issue_rows for a DigitalSignatureRecord."""
+    return {"signer_name": record.signer_name, "signer_role": record.signer_role,
+            "signature_path": record.signature_path, "stamp_path": record.stamp_path}
+
+
+def issue_batch(db, entries: list, use_pdf: bool, pdf_template_path: str, signer: dict | None = None) -> list:
+    """
+    Wrap, sign, anchor and persist a list of prepared rows.
+
+    Each entry is a dict with: student_name, course_name, cert_type,
+    organization, raw_data (the unwrapped OA document) and optionally
+    fingerprint (see bulk_mapping.row_fingerprint).
+    With a signer (see signer_from_record) PDF certificates are rendered
+    with its signature and stamp and issued as signed.
+    Returns (issued, renders): the summary dicts reported back to the client,
+    in input order, and the render_pool result of every PDF rendered (see
+    render_failures). The caller is responsible for committing the session.
+    """
+    groups: dict[str, list] = {}
+    for idx, entry in enumerate(entries):
+        groups.setdefault(entry["organization"], []).append(idx)
+
+    # Salting and hashing is the CPU-bound part; it runs across the worker pool
+    salted_docs, target_hashes = worker_pool.wrap_many(
+        [(entry["raw_data"], make_issuers(entry["organization"])) for entry in entries]
+    )
+
+    sign_now = use_pdf and signer is not None
+    signature_entry = None
+    if sign_now:
+        signature_entry = {"signer_name": signer["signer_name"], "signer_role": signer["signer_role"],
+                           "applied_at": datetime.datetime.now().isoformat()}
+    output_suffix = "signed" if sign_now else "base"
+    # Stored on every row, so later renders format the same issue date
+    issued_at = datetime.datetime.now()
+    placeholder_map = pdf_utils.get_placeholder_map(pdf_template_path) if use_pdf else None
+
+    issued: list = [None] * len(entries)
+    renders: list = []
+    pending: list = []  # certificate rows not inserted yet
+    for organization, indexes in groups.items():
+        oa_docs = oa_logic.make_batch_documents([salted_docs[i] for i in indexes],
+                                                [target_hashes[i] for i in indexes])
+
+        # One signature and one registry entry for the whole batch
+        merkle_root = oa_docs[0]["signature"]["merkleRoot"]
+        sig = crypto_utils.sign_data(merkle_root)
+
+        batch_id = str(uuid.uuid4())
+        # Through the ORM, so registry_index sees the new root on commit.
+        # Flushed first: the certificate rows below reference it.
+        db.add(models.DocumentRegistry(id=batch_id, merkle_root=merkle_root,
+                                       issuer_name="EduCerts Admin", organization=organization,
+                                       cert_count=len(indexes)))
+        db.flush()
+
+        claim_pins = claim_codes.allocate(db, organization, len(indexes))
+        claim_expires_at = claim_codes.expiry()
+
+        for oa_doc in oa_docs:
+            oa_doc["signature"]["signature"] = sig
+            oa_doc["signature"]["keyId"] = crypto_utils.ACTIVE_KEY_ID
+
+        cert_ids = [str(uuid.uuid4()) for _ in indexes]
+        rendered_paths = [None] * len(indexes)
+        layouts = [None] * len(indexes)
+        if use_pdf:
+            # Render PDFs if a PDF template exists, across the render pool
+            values = [certificate_fields.pdf_field_values(cert_id, entries[i]["student_name"],
+                                                          entries[i]["course_name"], issued_at, sig,
+                                                          oa_doc, placeholder_map)
+                      for i, oa_doc, cert_id in zip(indexes, oa_docs, cert_ids)]
+            results = render_pool.render_many(pdf_template_path, [
+                (cert_id, field_values, f"generated_certs/{cert_id}_{output_suffix}.pdf")
+                for cert_id, field_values in zip(cert_ids, values)],
+                signature_img_path=signer["signature_path"] if sign_now else None,
+                stamp_img_path=signer["stamp_path"] if sign_now else None)
+            for n, result in enumerate(results):
+                rendered_paths[n] = result["output_path"]
+                if result.get("layout"):
+                    layouts[n] = {**result["layout"], "values_sha256": render_cache.values_hash(values[n])}
+            renders.extend(results)
+            if sign_now:
+                # Signed PDFs are what /api/download and /api/thumbnail serve
+                thumbnails.submit(rendered_paths)
+
+        for i, oa_doc, claim_pin, cert_id, rendered_path, layout in zip(indexes, oa_docs, claim_pins,
+                                                                        cert_ids, rendered_paths, layouts):
+            entry = entries[i]
+            # A failed render is issued unsigned and can be signed later through /api/sign/apply
+            signed = sign_now and rendered_path is not None
+            signing_status = "signed" if signed else "unsigned"
+
+            pending.append(dict(
+                id=cert_id, student_name=entry["student_name"], course_name=entry["course_name"],
+                cert_type=entry["cert_type"], data_payload=oa_doc, signature=sig, issued_at=issued_at,
+                target_hash=oa_doc["signature"]["targetHash"],
+                row_fingerprint=entry.get("fingerprint"),
+                claim_pin=claim_pin, claim_pin_expires_at=claim_expires_at, organization=organization, batch_id=batch_id,
+                template_type="pdf" if use_pdf else "html",
+                rendered_pdf_path=rendered_path,
+                layout_manifest=layout,
+                signing_status=signing_status,
+                digital_signatures=[dict(signature_entry)] if signed else None
+            ))
+            if len(pending) >= CERT_INSERT_CHUNK_SIZE:
+                _insert_certificates(db, pending)
+                pending = []
+            issued[i] = {"id": cert_id, "student_name": entry["student_name"],
+                         "course_name": entry["course_name"], "signing_status": signing_status,
+                         "batch_id": batch_id}
+
+    _insert_certificates(db, pending)
+    return issued, renders
+
+
+def render_failures(issued: list, renders: list) -> list:
+    """The issued summary dicts of the certificates whose PDF failed to render, with the error."""
+    by_id = {cert["id"]: cert for cert in issued}
+    return [{**by_id[r["cert_id"]], "error": r["error"]} for r in renders if r["error"]]
+
+
+def _existing_certificates(db, fingerprints: list) -> dict:
+    """Live (non-revoked) certificates already issued for these row fingerprints."""
+    if not fingerprints:
+        return {}
+    found = db.query(models.Certificate.row_fingerprint, models.Certificate.id,
+                     models.Certificate.student_name, models.Certificate.course_name,
+                     models.Certificate.signing_status, models.Certificate.batch_id).filter(
+        models.Certificate.row_fingerprint.in_(fingerprints),
+        models.Certificate.revoked == False
+    )
+    return {fp: {"id": cert_id, "student_name": student_name, "course_name": course_name,
+                 "signing_status": signing_status, "batch_id": batch_id}
+            for fp, cert_id, student_name, course_name, signing_status, batch_id in found}
+
+
+def issue_rows(db, rows, plan, use_pdf: bool, pdf_template_path: str,
+               first_row_number: int = 2, force_reissue: bool = False, signer: dict | None = None):
+    """
+    Validate and issue upload rows BULK_CHUNK_SIZE at a time, one batch per chunk.
+    plan is the upload's bulk_mapping.MappingPlan; first_row_number is the
+    spreadsheet row number of the first row (the header is row 1).
+
+    Rows whose fingerprint already belongs to a live certificate (from an
+    earlier upload, an earlier chunk or an earlier row of this one) are not
+    issued again; that certificate is reported as skipped instead, unless
+    force_reissue is set. signer is passed on to issue_batch.
+
+    Generator: yields (rows_in_chunk, issued, rejected, skipped, renders)
+    after each chunk has been added to the session, so the caller decides whether to
+    flush or commit. Earlier chunks must be flushed for the duplicate check
+    to see them.
+    """
+    os.makedirs("generated_certs", exist_ok=True)
+    row_number = first_row_number
+    for chunk in bulk_ingest.chunked(rows, bulk_ingest.BULK_CHUNK_SIZE):
+        entries, rejected = plan.apply(chunk, row_number)
+        row_number += len(chunk)
+
+        skipped, repeated = [], []
+        if not force_reissue:
+            existing = _existing_certificates(db, list({e["fingerprint"] for e in entries}))
+            fresh, seen = [], set()
+            for entry in entries:
+                fp = entry["fingerprint"]
+                if fp in existing:
+                    skipped.append(existing[fp])
+                elif fp in seen:
+                    repeated.append(fp)  # same row twice in this chunk: only its first copy is issued
+                else:
+                    seen.add(fp)
+                    fresh.append(entry)
+            entries = fresh
+
+        issued, renders = issue_batch(db, entries, use_pdf, pdf_template_path, signer) if entries else ([], [])
+        if repeated:
+            issued_by_fp = {entry["fingerprint"]: cert for entry, cert in zip(entries, issued)}
+            skipped.extend(issued_by_fp[fp] for fp in repeated)
+        yield len(chunk), issued, rejected, skipped, renders
@@ -0,0 +1,280 @@
+"""
+bulk_jobs.py
+─────────────────────────────────────────────────────────────────────
+Background bulk issuance. An upload is recorded as a BulkJob and the
+request returns at once; a local thread pool issues its rows in chunks.
+
+  • every chunk of certificates is committed together with the job's
+    processed_rows, so a crash loses at most the chunk in flight
+  • on startup, queued and interrupted jobs are resubmitted and skip the
+    rows that were already committed
+  • a failed job keeps its upload and template snapshot: retry() resumes
+    it from the same offset, delete() removes it and its files
+  • progress() reports counts, percent done, rows/s and PDF render
+    totals for the polling and server-sent events endpoints; rejected rows
+    and failed renders are listed in the job's error_report
+
+Jobs run in the process that started them. When the API runs as several
+worker processes, each one would resume the same interrupted jobs on
+startup, so bulk jobs should be served by a single process.
+
+Configuration (environment):
+  BULK_JOB_WORKERS   jobs processed concurrently (default: 1)
+  BULK_JOB_DIR       uploads and template snapshots of unfinished jobs (default: bulk_jobs)
+"""
+
+import datetime
+import itertools
+import os
+import shutil
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import bulk_ingest
+import bulk_issue
+import bulk_mapping
+import database
+import models
+import pdf_utils
+
+BULK_JOB_WORKERS = int(os.getenv("BULK_JOB_WORKERS", "1"))
+BULK_JOB_DIR = os.getenv("BULK_JOB_DIR", "bulk_jobs")
+
+FINISHED = ("completed", "failed")
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+_stopping = threading.Event()
+# job id -> {"started": monotonic time, "offset": processed_rows} of the run in progress
+_runs: dict[str, dict] = {}
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(BULK_JOB_WORKERS, 1), thread_name_prefix="bulk-job")
+        return _executor
+
+
+def create_job(db, upload_path: str, filename: str, kind: str, template_fields: set,
+               use_pdf: bool, pdf_template_path: str, course_hints: tuple, id_length: int,
+               force_reissue: bool = False, signature_record_id: int | None = None) -> models.BulkJob:
+    """
+    Move a spooled upload into BULK_JOB_DIR and record it as a queued job.
+    The PDF template is copied too, so a resumed job renders with the template
+    it was submitted with. The caller commits, then calls submit().
+    """
+    job_id = str(uuid.uuid4())
+    os.makedirs(BULK_JOB_DIR, exist_ok=True)
+    file_path = os.path.join(BULK_JOB_DIR, f"{job_id}.{kind}")
+    shutil.move(upload_path, file_path)
+    template_path = None
+    if use_pdf:
+        template_path = os.path.join(BULK_JOB_DIR, f"{job_id}_template.pdf")
+        shutil.copyfile(pdf_template_path, template_path)
+
+    job = models.BulkJob(
+        id=job_id, status="queued", filename=filename, file_kind=kind, file_path=file_path,
+        template_path=template_path, template_fields=sorted(template_fields),
+        course_hints=list(course_hints), id_length=id_length, force_reissue=force_reissue,
+        signature_record_id=signature_record_id,
+        processed_rows=0, issued_count=0, skipped_count=0, rejected_count=0, error_report=[],
+    )
+    db.add(job)
+    return job
+
+
+def submit(job_id: str):
+    _get_executor().submit(run_job, job_id)
+
+
+def _count_rows(path: str, kind: str) -> int:
+    with bulk_ingest.open_rows(path, kind) as (_, rows):
+        return sum(1 for _ in rows)
+
+
+def _remove_files(job: models.BulkJob):
+    sidecar = pdf_utils.placeholder_sidecar_path(job.template_path) if job.template_path else None
+    for path in (job.file_path, job.template_path, sidecar):
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
+def run_job(job_id: str):
+    """Issue the remaining rows of a job, committing progress after every chunk."""
+    db = database.SessionLocal()
+    try:
+        job = db.get(models.BulkJob, job_id)
+        if job is None or job.status in FINISHED:
+            return
+        if job.total_rows is None:
+            job.total_rows = _count_rows(job.file_path, job.file_kind)
+        job.status = "running"
+        job.started_at = job.started_at or _now()
+        db.commit()
+        _runs[job_id] = {"started": time.monotonic(), "offset": job.processed_rows}
+
+        signer = None
+        if job.signature_record_id is not None:
+            record = db.get(models.DigitalSignatureRecord, job.signature_record_id)
+            if record is None:
+                raise ValueError(f"Signature record {job.signature_record_id} no longer exists")
+            signer = bulk_issue.signer_from_record(record)
+
+        with bulk_ingest.open_rows(job.file_path, job.file_kind) as (headers, rows):
+            plan = bulk_mapping.MappingPlan(headers, set(job.template_fields),
+                                            tuple(job.course_hints), job.id_length)
+            # Rows before the committed offset were handled by an earlier run
+            rows = itertools.islice(rows, job.processed_rows, None)
+            for count, issued, rejected, skipped, renders in bulk_issue.issue_rows(
+                db, rows, plan, job.template_path is not None, job.template_path or "",
+                first_row_number=job.processed_rows + 2, force_reissue=job.force_reissue,
+                signer=signer,
+            ):
+                job.processed_rows += count
+                job.issued_count += len(issued)
+                job.skipped_count += len(skipped)
+                if rejected:
+                    job.rejected_count += len(rejected)
+                    report = job.error_report or []
+                    job.error_report = report + rejected[:bulk_mapping.MAX_REPORTED_ERRORS - len(report)]
+                if renders:
+                    job.render_stats = _add_render_stats(job.render_stats, renders)
+                    failures = [{"id": f["id"], "student_name": f["student_name"], "course_name": f["course_name"],
+                                 "errors": [f"PDF render failed: {f['error']}"]}
+                                for f in bulk_issue.render_failures(issued, renders)]
+                    report = job.error_report or []
+                    job.error_report = report + failures[:bulk_mapping.MAX_REPORTED_ERRORS - len(report)]
+                db.commit()
+                if _stopping.is_set():
+                    # Left as "running": resumed from this offset on the next startup
+                    return
+
+        job.status = "completed"
+        job.finished_at = _now()
+        db.commit()
+        _remove_files(job)
+        print(f"BULK JOB {job_id}: issued {job.issued_count} certificates")
+    except Exception as e:
+        db.rollback()
+        print(f"BULK JOB ERROR {job_id}: {e}")
+        traceback.print_exc()
+        job = db.get(models.BulkJob, job_id)
+        if job is not None:
+            # Files are kept, so the job can be retried from processed_rows
+            job.status = "failed"
+            job.error = str(e)
+            job.finished_at = _now()
+            db.commit()
+    finally:
+        _runs.pop(job_id, None)
+        db.close()
+
+
+def _add_render_stats(stats: dict | None, renders: list) -> dict:
+    """Running render totals of a job: certificates, failures, and latency of the successful ones."""
+    stats = dict(stats or {"count": 0, "failed": 0, "total_ms": 0.0, "max_ms": None})
+    latencies = [r["ms"] for r in renders if r["error"] is None]
+    stats["count"] += len(renders)
+    stats["failed"] += len(renders) - len(latencies)
+    stats["total_ms"] = round(stats["total_ms"] + sum(latencies), 2)
+    if latencies:
+        stats["max_ms"] = max(latencies + [stats["max_ms"] or 0])
+    return stats
+
+
+def retry(job: models.BulkJob):
+    """
+    Queue a failed job again; it resumes after its last committed chunk.
+    The caller commits, then calls submit().
+    """
+    if job.status != "failed":
+        raise ValueError(f"Only failed jobs can be retried (job is {job.status})")
+    if not os.path.exists(job.file_path) or (job.template_path and not os.path.exists(job.template_path)):
+        raise ValueError("The job's upload is no longer available")
+    job.status = "queued"
+    job.error = None
+    job.finished_at = None
+
+
+def delete(db, job: models.BulkJob):
+    """Remove a finished job and whatever files it still has. The caller commits."""
+    if job.status not in FINISHED:
+        raise ValueError(f"Only completed or failed jobs can be deleted (job is {job.status})")
+    _remove_files(job)
+    db.delete(job)
+
+
+def resume_pending():
+    """Resubmit jobs that were queued or running when the process last stopped."""
+    db = database.SessionLocal()
+    try:
+        job_ids = [job_id for (job_id,) in db.query(models.BulkJob.id).filter(
+            models.BulkJob.status.in_(("queued", "running"))
+        ).order_by(models.BulkJob.created_at)]
+    finally:
+        db.close()
+    for job_id in job_ids:
+        submit(job_id)
+    if job_ids:
+        print(f"BULK JOBS: resumed {len(job_ids)} unfinished job(s)")
+
+
+def shutdown():
+    """Stop after the chunk in flight; unfinished jobs resume on the next startup."""
+    global _executor
+    _stopping.set()
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True, cancel_futures=True)
+            _executor = None
+    _stopping.clear()
+
+
+def progress(job: models.BulkJob) -> dict:
+    """Progress snapshot of a job, as returned by the polling and events endpoints."""
+    processed = job.processed_rows or 0
+    run = _runs.get(job.id)
+    rate = 0.0
+    if run:
+        elapsed = time.monotonic() - run["started"]
+        rate = (processed - run["offset"]) / elapsed if elapsed > 0 else 0.0
+    elif job.started_at and job.finished_at:
+        elapsed = (job.finished_at - job.started_at).total_seconds()
+        rate = processed / elapsed if elapsed > 0 else 0.0
+
+    total = job.total_rows
+    remaining = (total - processed) if total is not None else None
+    render = None
+    if job.render_stats:
+        stats = job.render_stats
+        rendered = stats["count"] - stats["failed"]
+        render = {"count": stats["count"], "failed": stats["failed"],
+                  "mean_ms": round(stats["total_ms"] / rendered, 2) if rendered else None,
+                  "max_ms": stats["max_ms"]}
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "filename": job.filename,
+        "total_rows": total,
+        "processed_rows": processed,
+        "issued": job.issued_count or 0,
+        "skipped": job.skipped_count or 0,
+        "rejected": job.rejected_count or 0,
+        "render": render,
+        "percent": round(100 * processed / total, 1) if total else (100.0 if job.status == "completed" else 0.0),
+        "rows_per_second": round(rate, 1),
+        "eta_seconds": round(remaining / rate, 1) if remaining is not None and rate > 0 else None,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
@@ -0,0 +1,183 @@
+"""
+bulk_mapping.py
+─────────────────────────────────────────────────────────────────────
+Mapping plans for bulk uploads.
+
+A MappingPlan is compiled once per upload from its header row:
+  • the student name and course columns (aliases via normalize_column_name)
+  • the column that fills each template placeholder (case-insensitive)
+
+plan.apply(rows) then works a column at a time over a chunk of rows:
+values are trimmed, checked against the same limits as the
+schemas.CertificateBase validators and the database column sizes, and
+turned into issuance entries. Rows that fail are returned in an error
+report instead of being signed, rendered and stored.
+
+Each entry carries a row_fingerprint, so re-uploading the same rows can
+be recognized and skipped (see bulk_issue.issue_rows).
+"""
+
+import datetime
+import hashlib
+import json
+import uuid
+
+# Placeholders filled in at render time, never taken from upload rows
+SYSTEM_FIELDS = {"issued_at", "cert_id", "signature", "qr_code", "digital_signature", "stamp"}
+
+DEFAULT_COURSE_HINTS = ("course", "subject", "prog")
+
+# (min, max) lengths: names match schemas.CertificateBase, the rest the models' column sizes
+NAME_LENGTH = (2, 200)
+CERT_TYPE_LENGTH = (1, 50)
+ORGANIZATION_LENGTH = (1, 200)
+
+# Rejected rows listed in a response; all of them are counted
+MAX_REPORTED_ERRORS = 1000
+
+
+class MappingError(ValueError):
+    """The upload's headers cannot be mapped (e.g. no student name column)."""
+
+
+def normalize_column_name(header: str) -> str:
+    """
+    Normalizes a header name (lowercase, strip, underscores).
+    Maps common aliases to student_name and course_name.
+    """
+    if not header:
+        return ""
+    h = str(header).lower().strip().replace(" ", "_").replace("-", "_")
+
+    # Aliases for student_name
+    if h in {"student_name", "student", "full_name", "name", "recipient", "recipient_name", "candidate_name", "student_fullname",
+             "rollno", "roll_no", "enrn", "enrollment_no", "student_id", "reg_no", "registration_number"}:
+        return "student_name"
+
+    # Aliases for course_name
+    if h in {"course_name", "course", "subject", "program", "training_name", "training", "module", "study_program",
+             "subject_1", "subject_code", "course_code"}:
+        return "course_name"
+
+    return h
+
+
+def find_columns(headers: list, course_hints: tuple) -> tuple:
+    """Pick the student name and course columns of an upload from its headers."""
+    name_col = next((h for h in headers if normalize_column_name(h) == "student_name"), None)
+    if not name_col:
+        name_col = next((h for h in headers if "name" in h.lower() or "roll" in h.lower() or "id" in h.lower()), None)
+
+    course_col = next((h for h in headers if normalize_column_name(h) == "course_name"), None)
+    if not course_col:
+        course_col = next((h for h in headers if any(hint in h.lower() for hint in course_hints)), None)
+    return name_col, course_col
+
+
+def _column(rows: list, header) -> list:
+    if header is None:
+        return [""] * len(rows)
+    return [(row.get(header) or "").strip() for row in rows]
+
+
+def _length_error(label: str, value: str, limits: tuple):
+    low, high = limits
+    if len(value) < low or len(value) > high:
+        if low <= 1:
+            return f"{label} must be at most {high} characters"
+        return f"{label} must be {low}-{high} characters"
+    return None
+
+
+def row_fingerprint(organization: str, student_name: str, course_name: str, fields: dict,
+                    student_id: str = "N/A", cert_type: str = "certificate") -> str:
+    """
+    Stable identity of an upload row: SHA-256 over its organization, student
+    (name and id), course, certificate type and mapped template field values
+    (after trimming).
+    """
+    canonical = json.dumps([organization, student_name, student_id, course_name, cert_type,
+                            sorted(fields.items())],
+                           ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class MappingPlan:
+    def __init__(self, headers: list, template_fields: set,
+                 course_hints: tuple = DEFAULT_COURSE_HINTS, id_length: int = 8):
+        headers = [h for h in headers if h]
+        self.id_length = id_length
+        self.name_col, self.course_col = find_columns(headers, course_hints)
+        if self.name_col is None:
+            raise MappingError(f"No student name column found in headers: {', '.join(headers) or '(none)'}")
+        if self.course_col is None:
+            raise MappingError(f"No course column found in headers: {', '.join(headers) or '(none)'}")
+
+        by_lower = {h.lower(): h for h in headers}
+        self.field_cols = {
+            field: by_lower[field.lower()]
+            for field in sorted(template_fields)
+            if field not in SYSTEM_FIELDS and field.lower() in by_lower
+        }
+        self.unmapped_fields = sorted(
+            f for f in template_fields
+            if f not in SYSTEM_FIELDS and f not in self.field_cols and f not in ("student_name", "course_name")
+        )
+        self.cert_type_col = by_lower.get("cert_type")
+        self.organization_col = by_lower.get("organization")
+        self.student_id_col = by_lower.get("student_id")
+
+    def describe(self) -> dict:
+        """The resolved mapping, reported back with the upload results."""
+        return {
+            "student_name": self.name_col,
+            "course_name": self.course_col,
+            "fields": self.field_cols,
+            "unmapped_fields": self.unmapped_fields,
+        }
+
+    def apply(self, rows: list, first_row_number: int) -> tuple[list, list]:
+        """
+        Validate a chunk of rows and build issuance entries for the valid ones.
+        first_row_number is the spreadsheet row number of rows[0] (the header
+        is row 1). Returns (entries, rejected).
+        """
+        names = _column(rows, self.name_col)
+        courses = _column(rows, self.course_col)
+        cert_types = [v or "certificate" for v in _column(rows, self.cert_type_col)]
+        organizations = [v or "EduCerts Academy" for v in _column(rows, self.organization_col)]
+        student_ids = ([v or "N/A" for v in _column(rows, self.student_id_col)]
+                       if self.student_id_col else ["N/A"] * len(rows))
+        fields = {field: _column(rows, col) for field, col in self.field_cols.items()}
+
+        errors = [[] for _ in rows]
+        for label, values, limits in (("Student name", names, NAME_LENGTH),
+                                      ("Course name", courses, NAME_LENGTH),
+                                      ("cert_type", cert_types, CERT_TYPE_LENGTH),
+                                      ("organization", organizations, ORGANIZATION_LENGTH)):
+            for i, value in enumerate(values):
+                error = _length_error(label, value, limits)
+                if error:
+                    errors[i].append(error)
+
+        issued_on = datetime.datetime.now().isoformat()
+        entries, rejected = [], []
+        for i in range(len(rows)):
+            if errors[i]:
+                rejected.append({"row": first_row_number + i, "student_name": names[i],
+                                 "course_name": courses[i], "errors": errors[i]})
+                continue
+            row_fields = {field: values[i] for field, values in fields.items()}
+            raw_data = {
+                "id": str(uuid.uuid4())[:self.id_length],
+                "type": cert_types[i],
+                "name": courses[i],
+                "issuedOn": issued_on,
+                "recipient": {"name": names[i], "studentId": student_ids[i]},
+                **{k: v for k, v in row_fields.items() if k not in ("student_id", "organization")}
+            }
+            entries.append({"student_name": names[i], "course_name": courses[i], "cert_type": cert_types[i],
+                            "organization": organizations[i], "raw_data": raw_data, "fields": row_fields,
+                            "fingerprint": row_fingerprint(organizations[i], names[i], courses[i], row_fields,
+                                                           student_ids[i], cert_types[i])})
+        return entries, rejected
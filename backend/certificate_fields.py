@@ -0,0 +1,76 @@
+"""
+certificate_fields.py
+─────────────────────────────────────────────────────────────────────
+Values overlaid on the PDF template for a certificate.
+
+Bulk issuance and /api/download build them with the same function, so
+the render made at issuance is the certificate /api/download would
+render from the same template. Issuance stores render_cache.values_hash()
+of them in the certificate's layout manifest, and /api/download serves
+that render for as long as the template and the values still match.
+
+The verification QR code is only generated for templates that have a
+{{qr_code}} placeholder; it costs more than the rest of a render.
+
+Configuration (environment):
+  FRONTEND_URL   base of the verification URL in the QR code (default: http://localhost:3000)
+"""
+
+import base64
+import datetime
+import os
+from io import BytesIO
+
+import qrcode
+
+
+def verify_url(cert_id: str) -> str:
+    return f"{os.getenv('FRONTEND_URL', 'http://localhost:3000')}/verify?id={cert_id}"
+
+
+def generate_qr_base64(data: str):
+    qr = qrcode.QRCode(version=1, box_size=10, border=5)
+    qr.add_data(data)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+    buffered = BytesIO()
+    img.save(buffered, format="PNG")
+    return base64.b64encode(buffered.getvalue()).decode()
+
+
+def pdf_field_values(cert_id: str, student_name: str, course_name: str, issued_at: datetime.datetime,
+                     signature: str, data_payload: dict | None, placeholder_map: dict | None = None) -> dict:
+    """
+    Values overlaid on the PDF template. placeholder_map is that of the
+    template rendered: without a qr_code placeholder, no QR code is made.
+    """
+    field_values = {
+        "student_name": student_name,
+        "course_name": course_name,
+        "issued_at": issued_at.strftime("%Y-%m-%d"),
+        "cert_id": cert_id,
+        "signature": signature[:20] + "...",
+    }
+    if placeholder_map is None or "qr_code" in placeholder_map:
+        field_values["qr_code"] = generate_qr_base64(verify_url(cert_id))
+    # Also overlay payload fields - ROBUST EXTRACTION
+    payload_data = data_payload or {}
+    # Try both direct payload and OA 'data' nested payload
+    candidates = [payload_data, payload_data.get("data", {})]
+
+    for source in candidates:
+        if not isinstance(source, dict): continue
+        for k, v in source.items():
+            # OA might have values like {"value": "John"} or just "John"}
+            if isinstance(v, dict) and "value" in v:
+                field_values.setdefault(k, v["value"])
+            elif isinstance(v, (str, int, float)):
+                field_values.setdefault(k, v)
+            elif isinstance(v, dict):
+                # Check nested objects like recipient.name
+                for subk, subv in v.items():
+                    if isinstance(subv, (str, int, float)):
+                        field_values.setdefault(f"{k}_{subk}", subv)
+                        field_values.setdefault(subk, subv)
+    return field_values
+
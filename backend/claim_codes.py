@@ -0,0 +1,109 @@
+"""
+claim_codes.py
+─────────────────────────────────────────────────────────────────────
+Claim PINs used by students to claim certificates into their wallet.
+
+  • codes are 6 digits drawn from the OS CSPRNG (secrets)
+  • a partial unique index on (organization, claim_pin) keeps them
+    collision-free per organization and makes /api/claim one index lookup
+  • allocate() draws a whole batch at once and re-draws only the codes
+    already taken, checked with one IN query per round
+  • a code leaves the index (claim_pin = NULL) once it is claimed or
+    expires, which keeps the live code space small
+
+Two batches allocating concurrently for the same organization can still
+draw the same free code; the unique index then rejects the second insert
+instead of creating a duplicate.
+
+Configuration (environment):
+  CLAIM_CODE_TTL_DAYS   days a code stays claimable (default: 0 = no expiry)
+"""
+
+import datetime
+import os
+import secrets
+
+from sqlalchemy import func, update
+
+import models
+
+CLAIM_CODE_DIGITS = 6
+CLAIM_CODE_TTL_DAYS = int(os.getenv("CLAIM_CODE_TTL_DAYS", "0"))
+
+_MAX_ROUNDS = 32
+
+
+def _draw() -> str:
+    return f"{secrets.randbelow(10 ** CLAIM_CODE_DIGITS):0{CLAIM_CODE_DIGITS}d}"
+
+
+def expiry():
+    """Expiry timestamp for codes issued now, or None when codes do not expire."""
+    if CLAIM_CODE_TTL_DAYS <= 0:
+        return None
+    return datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=CLAIM_CODE_TTL_DAYS)
+
+
+def is_expired(expires_at) -> bool:
+    if expires_at is None:
+        return False
+    if expires_at.tzinfo is None:  # SQLite returns naive UTC timestamps
+        expires_at = expires_at.replace(tzinfo=datetime.timezone.utc)
+    return expires_at <= datetime.datetime.now(datetime.timezone.utc)
+
+
+def allocate(db, organization: str, count: int) -> list:
+    """Draw `count` codes that are unused within the organization and distinct from each other."""
+    codes: list = []
+    chosen: set = set()
+    for _ in range(_MAX_ROUNDS):
+        need = count - len(codes)
+        if need <= 0:
+            return codes
+        # Over-draw a little so one round is usually enough
+        candidates = {_draw() for _ in range(need + need // 8 + 2)} - chosen
+        taken = {pin for (pin,) in db.query(models.Certificate.claim_pin).filter(
+            models.Certificate.organization == organization,
+            models.Certificate.claim_pin.in_(candidates)
+        )}
+        for code in candidates - taken:
+            if len(codes) == count:
+                break
+            codes.append(code)
+            chosen.add(code)
+    if len(codes) < count:
+        raise RuntimeError(f"Could not allocate {count} claim codes for {organization}: code space exhausted")
+    return codes
+
+
+def purge_expired(db) -> int:
+    """Drop expired codes from the index. Returns the number of codes removed."""
+    result = db.execute(
+        update(models.Certificate)
+        .where(models.Certificate.claim_pin.is_not(None),
+               models.Certificate.claim_pin_expires_at <= datetime.datetime.now(datetime.timezone.utc))
+        .values(claim_pin=None)
+    )
+    return result.rowcount
+
+
+def reassign_duplicates(db) -> int:
+    """
+    Give a fresh code to every certificate whose (organization, claim_pin) is
+    shared with an older one, so the unique index can be created on existing
+    data. Returns the number of certificates updated.
+    """
+    duplicates = db.query(models.Certificate.organization, models.Certificate.claim_pin).filter(
+        models.Certificate.claim_pin.is_not(None)
+    ).group_by(models.Certificate.organization, models.Certificate.claim_pin).having(func.count() > 1).all()
+
+    updated = 0
+    for organization, pin in duplicates:
+        certs = db.query(models.Certificate).filter(
+            models.Certificate.organization == organization, models.Certificate.claim_pin == pin
+        ).order_by(models.Certificate.issued_at).all()
+        for cert, code in zip(certs[1:], allocate(db, organization, len(certs) - 1)):
+            cert.claim_pin = code
+            updated += 1
+        db.flush()
+    return updated
@@ -1,5 +1,9 @@
+import functools
 import hashlib
 import json
+import threading
+from collections import OrderedDict
+from typing import Optional
 from jose import jws
 from jose.constants import ALGORITHMS
 
@@ -15,7 +19,11 @@ import base64
 # Load or generate a persistent issuer key
 import os
 
-KEY_FILE = "issuer_private_key.pem"
+# The active key signs new documents. After a rotation, list the previous key
+# files (private or public PEM) in ISSUER_RETIRED_KEY_FILES, comma separated,
+# so documents they signed keep verifying.
+KEY_FILE = os.getenv("ISSUER_KEY_FILE", "issuer_private_key.pem")
+RETIRED_KEY_FILES = [p.strip() for p in os.getenv("ISSUER_RETIRED_KEY_FILES", "").split(",") if p.strip()]
 
 if os.path.exists(KEY_FILE):
     with open(KEY_FILE, "rb") as f:
@@ -31,12 +39,72 @@ else:
 
 public_key = private_key.public_key()
 
-def get_public_key_pem():
-    return public_key.public_bytes(
+def key_id_for(key) -> str:
+    """Short id of an Ed25519 public key: SHA-256 of its raw bytes, first 8 bytes in hex."""
+    raw = key.public_bytes(encoding=serialization.Encoding.Raw, format=serialization.PublicFormat.Raw)
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+def _public_pem(key) -> str:
+    return key.public_bytes(
         encoding=serialization.Encoding.PEM,
         format=serialization.PublicFormat.SubjectPublicKeyInfo
     ).decode('utf-8')
 
+def _load_public_key(path: str):
+    with open(path, "rb") as f:
+        data = f.read()
+    if b"PRIVATE KEY" in data:
+        return serialization.load_pem_private_key(data, password=None).public_key()
+    return serialization.load_pem_public_key(data)
+
+# Issuer keyring: key id -> public key object, parsed once at startup
+ACTIVE_KEY_ID = key_id_for(public_key)
+keyring = {ACTIVE_KEY_ID: public_key}
+for _path in RETIRED_KEY_FILES:
+    _retired = _load_public_key(_path)
+    if not isinstance(_retired, ed25519.Ed25519PublicKey):
+        raise ValueError(f"Retired issuer key {_path} is not an Ed25519 key")
+    keyring.setdefault(key_id_for(_retired), _retired)
+
+# Served by /api/keys; the ring only changes on restart, so it is built once
+_published_keys = [
+    {"keyId": kid, "algorithm": "Ed25519", "publicKey": _public_pem(key),
+     "status": "active" if kid == ACTIVE_KEY_ID else "retired"}
+    for kid, key in keyring.items()
+]
+
+def get_public_keys() -> list:
+    return _published_keys
+
+def get_public_key_pem():
+    return _published_keys[0]["publicKey"]
+
+@functools.lru_cache(maxsize=64)
+def key_id_from_pem(pem: str) -> Optional[str]:
+    """Key id for a PEM embedded by older documents, or None if it is not in the keyring."""
+    try:
+        key = serialization.load_pem_public_key(pem.encode('utf-8'))
+    except Exception:
+        return None
+    if not isinstance(key, ed25519.Ed25519PublicKey):
+        return None
+    key_id = key_id_for(key)
+    return key_id if key_id in keyring else None
+
+def signing_key_id(signature_block: dict) -> Optional[str]:
+    """
+    Key id a document's signature block refers to: signature.keyId, or the
+    embedded publicKey of documents issued before key ids. Documents carrying
+    neither were signed with the original, single issuer key.
+    """
+    key_id = signature_block.get("keyId")
+    if key_id is not None:
+        return key_id if isinstance(key_id, str) else None
+    pem = signature_block.get("publicKey")
+    if pem is not None:
+        return key_id_from_pem(pem) if isinstance(pem, str) else None
+    return ACTIVE_KEY_ID
+
 def hash_data(data: dict) -> bytes:
     """Canonicalize and hash the data dictionary."""
     # Sort keys to ensure consistent ordering for hashing
@@ -49,11 +117,49 @@ def sign_data(data_str: str) -> str:
     signature = private_key.sign(data_str.encode('utf-8'))
     return base64.b64encode(signature).decode('utf-8')
 
-def verify_signature(data_str: str, signature_b64: str) -> bool:
-    """Verify the signature against the data using the issuer's public key."""
+def verify_signature(data_str: str, signature_b64: str, key_id: Optional[str] = ACTIVE_KEY_ID) -> bool:
+    """Verify the signature against the data using the keyring key with that id."""
+    key = keyring.get(key_id)
+    if key is None:
+        return False
     try:
         signature = base64.b64decode(signature_b64)
-        public_key.verify(signature, data_str.encode('utf-8'))
+        key.verify(signature, data_str.encode('utf-8'))
         return True
     except Exception:
         return False
+
+# Verified (key_id, merkle_root, signature) triples. Every document of a batch shares
+# the same root and signature, so the Ed25519 check only runs once per batch.
+VERIFIED_ROOTS_CACHE_SIZE = int(os.getenv("VERIFIED_ROOTS_CACHE_SIZE", "4096"))
+_verified_roots: "OrderedDict[tuple, bool]" = OrderedDict()
+_verified_roots_lock = threading.Lock()
+
+def cached_root_signature(merkle_root: str, signature_b64: str, key_id: Optional[str]):
+    """Memoized result for a (root, signature, key) triple, or None if it was never checked."""
+    memo_key = (key_id, merkle_root, signature_b64)
+    with _verified_roots_lock:
+        result = _verified_roots.get(memo_key)
+        if result is not None:
+            _verified_roots.move_to_end(memo_key)
+        return result
+
+def remember_root_signature(merkle_root: str, signature_b64: str, key_id: Optional[str], valid: bool):
+    """Record a result computed elsewhere (e.g. in a worker process)."""
+    memo_key = (key_id, merkle_root, signature_b64)
+    with _verified_roots_lock:
+        _verified_roots[memo_key] = valid
+        _verified_roots.move_to_end(memo_key)
+        while len(_verified_roots) > VERIFIED_ROOTS_CACHE_SIZE:
+            _verified_roots.popitem(last=False)
+
+def verify_root_signature(merkle_root: str, signature_b64: str, key_id: Optional[str]) -> bool:
+    """Memoized verify_signature for Merkle Roots."""
+    if not isinstance(merkle_root, str) or not isinstance(signature_b64, str):
+        return False
+    cached = cached_root_signature(merkle_root, signature_b64, key_id)
+    if cached is not None:
+        return cached
+    valid = verify_signature(merkle_root, signature_b64, key_id)
+    remember_root_signature(merkle_root, signature_b64, key_id, valid)
+    return valid
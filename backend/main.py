@@ -1,6 +1,7 @@
 from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Cookie, Response, Request, Form
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.templating import Jinja2Templates
 from fastapi.exceptions import RequestValidationError
 from fastapi.security import OAuth2PasswordRequestForm
@@ -12,16 +13,30 @@ import csv
 import io
 import datetime
 import hashlib
-import random
 import os
+import time
+import json
+import asyncio
+import itertools
 from xhtml2pdf import pisa
 from io import BytesIO
-import qrcode
-import base64
 from dotenv import load_dotenv
 
 import models, schemas, crypto_utils, database, auth_utils, oa_logic
 import pdf_utils
+import batch_export
+import certificate_fields
+import bulk_issue
+import bulk_ingest
+import bulk_jobs
+import bulk_mapping
+import claim_codes
+import worker_pool
+import registry_index
+import render_cache
+import render_pool
+import thumbnails
+import verify_cache
 
 load_dotenv()
 
@@ -43,6 +58,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def load_registry_index():
+    if not registry_index.REGISTRY_INDEX_ENABLED:
+        return
+    db = database.SessionLocal()
+    try:
+        registry_index.index.load(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def purge_expired_claim_codes_on_startup():
+    db = database.SessionLocal()
+    try:
+        purged = claim_codes.purge_expired(db)
+        db.commit()
+        if purged:
+            print(f"CLAIM CODES: removed {purged} expired PINs")
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def resume_bulk_jobs():
+    bulk_jobs.resume_pending()
+
+@app.on_event("shutdown")
+def shutdown_worker_pool():
+    # Bulk jobs first: the chunk in flight still uses the worker pools
+    bulk_jobs.shutdown()
+    worker_pool.shutdown()
+    render_pool.shutdown()
+    thumbnails.shutdown()
+
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request, exc):
     return JSONResponse(
@@ -66,27 +114,6 @@ def get_db():
     finally:
         db.close()
 
-def normalize_column_name(header: str) -> str:
-    """
-    Normalizes a header name (lowercase, strip, underscores).
-    Maps common aliases to student_name and course_name.
-    """
-    if not header:
-        return ""
-    h = str(header).lower().strip().replace(" ", "_").replace("-", "_")
-    
-    # Aliases for student_name
-    if h in {"student_name", "student", "full_name", "name", "recipient", "recipient_name", "candidate_name", "student_fullname",
-             "rollno", "roll_no", "enrn", "enrollment_no", "student_id", "reg_no", "registration_number"}:
-        return "student_name"
-    
-    # Aliases for course_name
-    if h in {"course_name", "course", "subject", "program", "training_name", "training", "module", "study_program",
-             "subject_1", "subject_code", "course_code"}:
-        return "course_name"
-
-    return h
-
 def get_current_user_from_cookie(
     access_token: Optional[str] = Cookie(default=None),
     db: Session = Depends(get_db)
@@ -115,15 +142,6 @@ def require_admin(current_user: models.User = Depends(require_user)) -> models.U
         raise HTTPException(status_code=403, detail="Admin access required")
     return current_user
 
-def generate_qr_base64(data: str):
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr.add_data(data)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
-    buffered = BytesIO()
-    img.save(buffered, format="PNG")
-    return base64.b64encode(buffered.getvalue()).decode()
-
 # ─────────────────────────────────────────────────────────────────────────────
 # Auth Endpoints
 # ─────────────────────────────────────────────────────────────────────────────
@@ -242,7 +260,7 @@ def issue_certificate(cert_data: schemas.CertificateCreate, db: Session = Depend
     merkle_root = oa_doc["signature"]["merkleRoot"]
     signature = crypto_utils.sign_data(merkle_root)
     oa_doc["signature"]["signature"] = signature
-    oa_doc["signature"]["publicKey"] = crypto_utils.get_public_key_pem()
+    oa_doc["signature"]["keyId"] = crypto_utils.ACTIVE_KEY_ID
 
     # Anchor Merkle Root to Document Registry
     batch_id = str(uuid.uuid4())
@@ -255,7 +273,7 @@ def issue_certificate(cert_data: schemas.CertificateCreate, db: Session = Depend
     )
     db.add(doc_registry_entry)
 
-    claim_pin = "".join([str(random.randint(0, 9)) for _ in range(6)])
+    claim_pin = claim_codes.allocate(db, organization, 1)[0]
 
     cert_id = str(uuid.uuid4())
     db_cert = models.Certificate(
@@ -265,7 +283,9 @@ def issue_certificate(cert_data: schemas.CertificateCreate, db: Session = Depend
         cert_type=cert_type,
         data_payload=oa_doc,
         signature=signature,
+        target_hash=oa_doc["signature"]["targetHash"],
         claim_pin=claim_pin,
+        claim_pin_expires_at=claim_codes.expiry(),
         organization=organization,
         batch_id=batch_id
     )
@@ -283,50 +303,75 @@ def issue_certificate(cert_data: schemas.CertificateCreate, db: Session = Depend
 def claim_certificate(claim_data: dict, db: Session = Depends(get_db)):
     pin = claim_data.get("pin")
     org = claim_data.get("organization")
+    # Claimed certificates have no PIN any more: never match on a missing one
+    if not isinstance(pin, str) or not pin.strip():
+        raise HTTPException(status_code=404, detail="No certificate found for this PIN and Organization")
 
+    # Single lookup on the unique (organization, claim_pin) index
     cert = db.query(models.Certificate).filter(
-        models.Certificate.claim_pin == pin,
-        models.Certificate.organization == org
+        models.Certificate.organization == org,
+        models.Certificate.claim_pin == pin.strip()
     ).first()
 
     if not cert:
         raise HTTPException(status_code=404, detail="No certificate found for this PIN and Organization")
+    if claim_codes.is_expired(cert.claim_pin_expires_at):
+        cert.claim_pin = None
+        db.commit()
+        raise HTTPException(status_code=400, detail="This PIN has expired")
     if cert.revoked:
         raise HTTPException(status_code=400, detail="This certificate has been revoked")
 
     cert.claimed = True
+    # One-time code: frees it for reuse and keeps the index small
+    cert.claim_pin = None
     db.commit()
     return cert.data_payload
 
+
+@app.post("/api/claim-codes/purge")
+def purge_expired_claim_codes(current_user: models.User = Depends(require_admin), db: Session = Depends(get_db)):
+    """Remove expired claim PINs from the index."""
+    purged = claim_codes.purge_expired(db)
+    db.commit()
+    return {"purged": purged}
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Verification (Phase 3: Check Document Registry)
 # ─────────────────────────────────────────────────────────────────────────────
 
-@app.post("/api/verify")
-def verify_certificate(request: schemas.VerificationRequest, db: Session = Depends(get_db)):
-    oa_doc = None
-    cert = None
+SIGNATURE_STRING_FIELDS = ("targetHash", "merkleRoot", "signature")
 
-    if request.certificate_id:
-        cert = db.query(models.Certificate).filter(models.Certificate.id == request.certificate_id).first()
-        if not cert:
-            raise HTTPException(status_code=404, detail="Certificate not found")
-        oa_doc = cert.data_payload
-    elif request.data_payload:
-        oa_doc = request.data_payload
-        signature = oa_doc.get("signature", {}).get("signature")
-        cert = db.query(models.Certificate).filter(models.Certificate.signature == signature).first()
-
-    if not oa_doc:
-        raise HTTPException(status_code=400, detail="Must provide certificate_id or data_payload")
+def signature_block(oa_doc: dict):
+    """
+    (signature block, error) of a submitted OA document. The block is {} when it is
+    missing; error says why the document cannot be verified, e.g. a non-string
+    targetHash, merkleRoot or signature.
+    """
+    block = oa_doc.get("signature")
+    if block is None:
+        return {}, None
+    if not isinstance(block, dict):
+        return {}, "signature must be an object"
+    for key in SIGNATURE_STRING_FIELDS:
+        if block.get(key) is not None and not isinstance(block[key], str):
+            return {}, f"signature.{key} must be a string"
+    if not isinstance(oa_doc.get("data") or {}, dict):
+        return {}, "data must be an object"
+    return block, None
+
+def build_verification_result(oa_doc: dict, cert: Optional[models.Certificate],
+                              is_signature_valid: bool, is_registry_valid: bool) -> dict:
+    """
+    Assemble the /api/verify response for one document.
+    Integrity and issuer identity are checked here; the signature and registry
+    results are passed in so batch verification can resolve them in bulk.
+    The document's signature block must have passed signature_block().
+    """
+    merkle_root = (oa_doc.get("signature") or {}).get("merkleRoot")
 
-    # 1. Integrity Check
-    merkle_root = oa_doc.get("signature", {}).get("merkleRoot")
-    signature = oa_doc.get("signature", {}).get("signature")
-    salted_data = oa_doc.get("data", {})
-    field_hashes = oa_logic.get_field_hashes(salted_data)
-    calculated_root = oa_logic.calculate_merkle_root(field_hashes)
-    is_integrity_valid = (calculated_root == merkle_root)
+    # 1. Integrity Check: data → targetHash, then proof → merkleRoot
+    is_integrity_valid = oa_logic.verify_document_integrity(oa_doc)
 
     # 2. Document Status
     is_issued = cert is not None
@@ -335,24 +380,13 @@ def verify_certificate(request: schemas.VerificationRequest, db: Session = Depen
     # 3. Issuer Identity
     issuer_name = "Unknown"
     is_identity_valid = False
-    issuers_data = oa_doc.get("data", {}).get("issuers", {}).get("value", [])
-    if issuers_data and issuers_data[0].get("name") in ["EduCerts Academy", cert.organization if cert else ""]:
-        issuer_name = f"{issuers_data[0].get('name')} (Verified)"
+    issuers = (oa_doc.get("data") or {}).get("issuers")
+    issuers_data = issuers.get("value") if isinstance(issuers, dict) else None
+    first_issuer = issuers_data[0] if isinstance(issuers_data, list) and issuers_data else None
+    if isinstance(first_issuer, dict) and first_issuer.get("name") in ["EduCerts Academy", cert.organization if cert else ""]:
+        issuer_name = f"{first_issuer.get('name')} (Verified)"
         is_identity_valid = True
 
-    # 4. Signature Check
-    is_signature_valid = crypto_utils.verify_signature(merkle_root, signature) if signature and merkle_root else False
-
-    # ── Phase 3: Document Registry Check ──
-    is_registry_valid = False
-    if merkle_root:
-        registry_entry = db.query(models.DocumentRegistry).filter(
-            models.DocumentRegistry.merkle_root == merkle_root,
-            models.DocumentRegistry.revoked == False
-        ).first()
-        is_registry_valid = registry_entry is not None
-    print(f"DEBUG VERIFY: Registry Valid: {is_registry_valid}")
-
     all_valid = is_integrity_valid and is_issued and is_not_revoked and is_identity_valid and is_signature_valid and is_registry_valid
 
     return {
@@ -396,6 +430,182 @@ def verify_certificate(request: schemas.VerificationRequest, db: Session = Depen
         }
     }
 
+def verify_oa_document(oa_doc: dict, cert: Optional[models.Certificate], db: Session) -> dict:
+    """Run the signature and registry checks for one document and build its verification result."""
+    block, error = signature_block(oa_doc)
+    if error:
+        raise HTTPException(status_code=400, detail=f"Malformed document: {error}")
+    merkle_root = block.get("merkleRoot")
+    signature = block.get("signature")
+    key_id = crypto_utils.signing_key_id(block)
+
+    # Signature Check
+    # Memoized per (root, signature, key): documents of one batch share a single Ed25519 check
+    is_signature_valid = crypto_utils.verify_root_signature(merkle_root, signature, key_id) if signature and merkle_root else False
+
+    # ── Phase 3: Document Registry Check ──
+    is_registry_valid = False
+    if merkle_root and registry_index.index.loaded:
+        # Answered from memory; forged roots are usually rejected by the Bloom filter alone
+        is_registry_valid = registry_index.index.is_anchored(merkle_root)
+    elif merkle_root:
+        registry_entry = db.query(models.DocumentRegistry).filter(
+            models.DocumentRegistry.merkle_root == merkle_root,
+            models.DocumentRegistry.revoked == False
+        ).first()
+        is_registry_valid = registry_entry is not None
+    print(f"DEBUG VERIFY: Registry Valid: {is_registry_valid}")
+
+    return build_verification_result(oa_doc, cert, is_signature_valid, is_registry_valid)
+
+@app.post("/api/verify")
+def verify_certificate(request: schemas.VerificationRequest, db: Session = Depends(get_db)):
+    if request.certificate_id:
+        # Shared links and QR codes verify the same certificate over and over: serve from cache
+        def compute():
+            cert = db.query(models.Certificate).filter(models.Certificate.id == request.certificate_id).first()
+            if not cert:
+                raise HTTPException(status_code=404, detail="Certificate not found")
+            oa_doc = cert.data_payload
+            return (oa_doc.get("signature") or {}).get("merkleRoot"), verify_oa_document(oa_doc, cert, db)
+
+        return verify_cache.cache.get_or_compute(request.certificate_id, compute)
+
+    if not request.data_payload:
+        raise HTTPException(status_code=400, detail="Must provide certificate_id or data_payload")
+
+    oa_doc = request.data_payload
+    block, error = signature_block(oa_doc)
+    if error:
+        raise HTTPException(status_code=400, detail=f"Malformed document: {error}")
+    cert = None
+    signature = block.get("signature")
+    target_hash = block.get("targetHash")
+    # Batch members share one signature, so resolve by targetHash first
+    if target_hash:
+        cert = db.query(models.Certificate).filter(models.Certificate.target_hash == target_hash).first()
+    if not cert:
+        # Documents issued before target hashes were recorded
+        cert = db.query(models.Certificate).filter(
+            models.Certificate.signature == signature,
+            models.Certificate.target_hash == None
+        ).first()
+
+    return verify_oa_document(oa_doc, cert, db)
+
+
+@app.get("/api/keys")
+def get_issuer_keys(response: Response):
+    """Issuer public keys by key id, for resolving signature.keyId of issued documents."""
+    # Keys only change on a restart with a rotated keyring, so clients may cache them
+    response.headers["Cache-Control"] = "public, max-age=3600"
+    return {"activeKeyId": crypto_utils.ACTIVE_KEY_ID, "keys": crypto_utils.get_public_keys()}
+
+
+@app.get("/api/verify/cache")
+def get_verify_cache_stats(current_user: models.User = Depends(require_admin)):
+    """Hit/miss counters and size of the verification result cache."""
+    return verify_cache.cache.stats()
+
+
+@app.post("/api/verify/batch")
+def verify_certificates_batch(request: schemas.BatchVerificationRequest, db: Session = Depends(get_db)):
+    """
+    Verify many certificates (by id) and/or OA documents in one call.
+    Certificates and registry roots are resolved with IN queries, and each distinct
+    (merkleRoot, signature) pair is checked once, across the worker pool for large batches.
+    Each result has the same shape as /api/verify, plus the input it refers to and
+    "valid". A certificate that is not found or a malformed document gets
+    {"valid": false, "error": ...} instead of failing the batch.
+    """
+    started = time.perf_counter()
+
+    # ── Resolve certificates with a couple of IN queries ──
+    ids = list(dict.fromkeys(request.certificate_ids))
+    certs_by_id = {}
+    if ids:
+        certs_by_id = {c.id: c for c in db.query(models.Certificate).filter(models.Certificate.id.in_(ids))}
+
+    # Each block is checked once; a malformed document is reported on its own, not raised
+    checked_blocks = [signature_block(doc) for doc in request.documents]
+    sig_blocks = [block for block, _ in checked_blocks]
+    target_hashes = list({b["targetHash"] for b in sig_blocks if b.get("targetHash")})
+    certs_by_target = {}
+    if target_hashes:
+        certs_by_target = {c.target_hash: c for c in db.query(models.Certificate).filter(
+            models.Certificate.target_hash.in_(target_hashes))}
+    # Documents issued before target hashes were recorded are matched by signature
+    legacy_sigs = list({b["signature"] for b in sig_blocks
+                        if b.get("targetHash") not in certs_by_target and b.get("signature")})
+    certs_by_sig = {}
+    if legacy_sigs:
+        certs_by_sig = {c.signature: c for c in db.query(models.Certificate).filter(
+            models.Certificate.signature.in_(legacy_sigs), models.Certificate.target_hash == None)}
+
+    items = []  # (input, oa_doc, signature block, cert, error)
+    for cert_id in request.certificate_ids:
+        cert = certs_by_id.get(cert_id)
+        oa_doc = cert.data_payload if cert else None
+        items.append(({"certificate_id": cert_id}, oa_doc, (oa_doc or {}).get("signature") or {}, cert, None))
+    for idx, (doc, (block, error)) in enumerate(zip(request.documents, checked_blocks)):
+        cert = None
+        if not error:
+            cert = certs_by_target.get(block.get("targetHash")) or certs_by_sig.get(block.get("signature"))
+        items.append(({"document_index": idx}, doc, block, cert, error))
+
+    # ── One signature check per distinct (root, signature, key) ──
+    def root_sig_key(block):
+        return block.get("merkleRoot"), block.get("signature"), crypto_utils.signing_key_id(block)
+
+    triples = [root_sig_key(block) for _, oa_doc, block, _, error in items if oa_doc and not error]
+    signature_results = worker_pool.verify_many([t for t in triples if t[0] and t[1]])
+
+    # ── Registry roots: in-memory index, or a single IN query ──
+    roots = list({r for r, _, _ in triples if isinstance(r, str)})
+    if registry_index.index.loaded:
+        anchored_roots = {r for r in roots if registry_index.index.is_anchored(r)}
+    elif roots:
+        anchored_roots = {r for (r,) in db.query(models.DocumentRegistry.merkle_root).filter(
+            models.DocumentRegistry.merkle_root.in_(roots), models.DocumentRegistry.revoked == False)}
+    else:
+        anchored_roots = set()
+
+    results = []
+    valid_count = 0
+    not_found = 0
+    malformed = 0
+    for item_input, oa_doc, block, cert, error in items:
+        if not oa_doc:
+            not_found += 1
+            results.append({"input": item_input, "valid": False, "error": "Certificate not found"})
+            continue
+        if error:
+            malformed += 1
+            results.append({"input": item_input, "valid": False, "error": f"Malformed document: {error}"})
+            continue
+        merkle_root, signature, key_id = root_sig_key(block)
+        result = build_verification_result(
+            oa_doc, cert,
+            signature_results.get((merkle_root, signature, key_id), False),
+            merkle_root in anchored_roots,
+        )
+        valid = bool(result["summary"]["all"])
+        valid_count += valid
+        results.append({"input": item_input, "valid": valid, **result})
+
+    return {
+        "summary": {
+            "total": len(items),
+            "valid": valid_count,
+            "invalid": len(items) - valid_count - not_found,
+            "not_found": not_found,
+            "malformed": malformed,
+            "signature_checks": len(signature_results),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+        },
+        "results": results
+    }
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Certificate CRUD
 # ─────────────────────────────────────────────────────────────────────────────
@@ -414,12 +624,20 @@ def revoke_certificate(cert_id: str, db: Session = Depends(get_db)):
     if not cert:
         raise HTTPException(status_code=404, detail="Certificate not found")
     cert.revoked = True
-    # Also revoke the batch in Document Registry
+    registry = None
+    # Also revoke the batch in Document Registry, unless other certificates share its Merkle Root
     if cert.batch_id:
         registry = db.query(models.DocumentRegistry).filter(models.DocumentRegistry.id == cert.batch_id).first()
+        if registry and (registry.cert_count or 1) > 1:
+            db.commit()
+            verify_cache.cache.invalidate_certificate(cert_id)
+            return {"message": "Certificate revoked; its batch stays anchored for the other certificates"}
         if registry:
             registry.revoked = True
     db.commit()
+    verify_cache.cache.invalidate_certificate(cert_id)
+    if registry:
+        verify_cache.cache.invalidate_root(registry.merkle_root)
     return {"message": "Certificate revoked and removed from Document Registry"}
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -443,6 +661,11 @@ def get_document_registry(db: Session = Depends(get_db)):
         for e in entries
     ]
 
+@app.get("/api/registry/index")
+def get_registry_index_stats(current_user: models.User = Depends(require_admin)):
+    """Size, memory footprint and false-positive rate of the in-memory registry index."""
+    return registry_index.index.stats()
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Misc
 # ─────────────────────────────────────────────────────────────────────────────
@@ -486,11 +709,13 @@ async def upload_pdf_template(file: UploadFile = File(...)):
     with open(pdf_template_path, "wb") as f:
         f.write(content)
 
-    # Extract placeholders with their bounding boxes
+    # Extract placeholders with their bounding boxes; renders reuse this map
     try:
-        placeholder_map = pdf_utils.extract_pdf_placeholders(pdf_template_path)
+        placeholder_map = pdf_utils.store_placeholder_map(pdf_template_path)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to parse PDF: {e}")
+    # Downloads rendered from the previous template must not be served again
+    render_cache.cache.drop_other_templates(pdf_template_path)
 
     all_fields = list(placeholder_map.keys())
     system_fields = {"issued_at", "cert_id", "signature", "qr_code"}
@@ -559,300 +784,291 @@ async def parse_template(file: UploadFile = File(...)):
     }
 
 
-@app.post("/api/templates/bulk-issue")
-async def bulk_issue_from_template(
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db)
-):
+def load_bulk_template():
     """
-    Reads a CSV file and issues one certificate per row.
-    The previously uploaded template (user_templates/custom_certificate.html) is used.
-    CSV column names are mapped directly to the template's {{ placeholder }} names.
-    Required CSV columns: student_name, course_name (at minimum).
+    The uploaded template used by bulk issuance, as (use_pdf, pdf_template_path,
+    template_fields), or None if no template was uploaded yet.
     """
     import re
-
-    if not file.filename.endswith(".csv"):
-        raise HTTPException(status_code=400, detail="Only CSV files are allowed")
-
-    # Determine which template to use
     pdf_template_path = "user_templates/template.pdf"
     html_template_path = "user_templates/custom_certificate.html"
     use_pdf = os.path.exists(pdf_template_path)
     use_html = os.path.exists(html_template_path)
 
     if not use_pdf and not use_html:
-        raise HTTPException(status_code=400, detail="No template uploaded yet.")
+        return None
 
     template_path = pdf_template_path if use_pdf else html_template_path
     if use_pdf:
         # USE ROBUST PDF EXTRACTION
-        placeholder_map = pdf_utils.extract_pdf_placeholders(template_path)
+        placeholder_map = pdf_utils.get_placeholder_map(template_path)
         template_fields = set(placeholder_map.keys())
     else:
         with open(template_path, "r", encoding="utf-8") as tf:
             template_text = tf.read()
         template_fields = set(re.findall(r"\{\{\s*([\w\s]+?)\s*\}\}", template_text))
         template_fields = {f.strip() for f in template_fields}
+    return use_pdf, pdf_template_path, template_fields
 
-    # Parse the file
-    content_bytes = await file.read()
-    content = content_bytes.decode("utf-8", errors="ignore")
-    csv_reader = csv.DictReader(io.StringIO(content))
-    raw_rows = list(csv_reader)
+BULK_EXCEL_COURSE_HINTS = ("course", "subject", "prog", "cent")
 
-    if not raw_rows:
-        raise HTTPException(status_code=400, detail="CSV file is empty")
+def compile_bulk_plan(headers: list, template_fields: set, course_hints: tuple, id_length: int) -> bulk_mapping.MappingPlan:
+    try:
+        return bulk_mapping.MappingPlan(headers, template_fields, course_hints, id_length)
+    except bulk_mapping.MappingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    rows = raw_rows
-    headers = list(rows[0].keys())
-    name_col = next((h for h in headers if normalize_column_name(h) == "student_name"), None)
-    if not name_col:
-        name_col = next((h for h in headers if "name" in h.lower() or "roll" in h.lower() or "id" in h.lower()), None)
-        
-    course_col = next((h for h in headers if normalize_column_name(h) == "course_name"), None)
-    if not course_col:
-        course_col = next((h for h in headers if "course" in h.lower() or "subject" in h.lower() or "prog" in h.lower()), None)
-    
-    issued_certs = []
-    system_auto = {"issued_at", "cert_id", "signature", "qr_code", "digital_signature", "stamp"}
-    os.makedirs("generated_certs", exist_ok=True)
+def get_issuance_signer(db: Session, signature_record_id: Optional[int], use_pdf: bool) -> Optional[dict]:
+    """
+    Signer for signing at issuance, from the signature_record_id query parameter.
+    Only PDF templates can be signed in the render pass.
+    """
+    if signature_record_id is None:
+        return None
+    if not use_pdf:
+        raise HTTPException(status_code=400, detail="Signing at issuance requires a PDF template.")
+    record = db.query(models.DigitalSignatureRecord).filter(
+        models.DigitalSignatureRecord.id == signature_record_id
+    ).first()
+    if not record:
+        raise HTTPException(status_code=404, detail="Signature record not found")
+    return bulk_issue.signer_from_record(record)
 
-    for row in rows:
-        student_name = row.get(name_col, "").strip() if name_col else "Student"
-        course_name = row.get(course_col, "").strip() if course_col else "Course"
-        
-        # Build data_payload: Match template placeholders to row keys (case-insensitive)
-        data_payload_fields = {}
-        row_keys_lower = {k.lower(): k for k in row.keys()}
-        for field in template_fields:
-            if field in system_auto: continue
-            f_lower = field.lower()
-            if f_lower in row_keys_lower:
-                data_payload_fields[field] = row[row_keys_lower[f_lower]].strip()
-
-        cert_type = row.get("cert_type", "certificate").strip() or "certificate"
-        organization = row.get("organization", "EduCerts Academy").strip() or "EduCerts Academy"
-
-        # Build raw OA document
-        raw_data = {
-            "id": str(uuid.uuid4())[:12],
-            "type": cert_type,
-            "name": course_name,
-            "issuedOn": datetime.datetime.now().isoformat(),
-            "recipient": {
-                "name": student_name,
-                "studentId": row.get("student_id", "N/A")
-            },
-            **{k: v for k, v in data_payload_fields.items() if k not in ("student_id", "organization")}
-        }
+def issue_bulk_rows(db: Session, rows, plan: bulk_mapping.MappingPlan,
+                    use_pdf: bool, pdf_template_path: str, force_reissue: bool,
+                    signer: Optional[dict] = None) -> dict:
+    """
+    Issue streamed upload rows BULK_CHUNK_SIZE at a time. Each chunk is flushed
+    and dropped from the session before the next one is read, so memory does
+    not grow with the upload. The caller commits.
+    Returns the issued, skipped and rejected rows and the PDF render results
+    for bulk_issue_response.
+    """
+    result = {"issued": [], "skipped": [], "errors": [], "rejected": 0, "renders": [], "render_failures": []}
+    for _, issued, rejected, skipped, renders in bulk_issue.issue_rows(
+        db, rows, plan, use_pdf, pdf_template_path, force_reissue=force_reissue, signer=signer
+    ):
+        result["issued"].extend(issued)
+        result["skipped"].extend(skipped)
+        result["rejected"] += len(rejected)
+        result["errors"].extend(rejected[:bulk_mapping.MAX_REPORTED_ERRORS - len(result["errors"])])
+        result["renders"].extend({"ms": r["ms"], "error": r["error"]} for r in renders)
+        failures = bulk_issue.render_failures(issued, renders)
+        result["render_failures"].extend(
+            failures[:bulk_mapping.MAX_REPORTED_ERRORS - len(result["render_failures"])])
+        db.flush()
+        db.expunge_all()
+    return result
+
+def bulk_issue_response(message: str, plan: bulk_mapping.MappingPlan, result: dict) -> dict:
+    return {
+        "message": message,
+        "count": len(result["issued"]),
+        "certificates": result["issued"],
+        # Rows already issued by an earlier upload, returned as they are
+        "skipped": len(result["skipped"]),
+        "skipped_certificates": result["skipped"],
+        "rejected": result["rejected"],
+        "errors": result["errors"],
+        # PDF render latency, and the certificates whose render failed (issued unsigned)
+        "render": render_pool.summarize(result["renders"]) if result["renders"] else None,
+        "render_failures": result["render_failures"],
+        "mapping": plan.describe(),
+    }
 
-        issuers = [{"name": organization, "url": "https://educerts.io",
-                    "documentStore": "0x007d40224f6562461633ccfbaffd359ebb2fc9ba",
-                    "identityProof": {"type": "DNS-TXT", "location": "educerts.io"}}]
-
-        oa_doc = oa_logic.wrap_document(raw_data, issuers=issuers)
-        merkle_root = oa_doc["signature"]["merkleRoot"]
-        sig = crypto_utils.sign_data(merkle_root)
-        oa_doc["signature"]["signature"] = sig
-        oa_doc["signature"]["publicKey"] = crypto_utils.get_public_key_pem()
-
-        batch_id = str(uuid.uuid4())
-        db.add(models.DocumentRegistry(id=batch_id, merkle_root=merkle_root,
-                                       issuer_name="EduCerts Admin", organization=organization, cert_count=1))
-
-        claim_pin = "".join([str(random.randint(0, 9)) for _ in range(6)])
-        cert_id = str(uuid.uuid4())
-
-        # Render PDF if PDF template exists
-        rendered_path = None
-        if use_pdf:
-            issued_at = datetime.datetime.now().strftime("%Y-%m-%d")
-            field_values = {
-                "student_name": student_name,
-                "course_name": course_name,
-                "issued_at": issued_at,
-                "cert_id": cert_id,
-                "signature": sig[:20] + "...",
-                **data_payload_fields
-            }
-            out_path = f"generated_certs/{cert_id}_base.pdf"
-            try:
-                pdf_utils.render_pdf_certificate(pdf_template_path, field_values, out_path)
-                rendered_path = out_path
-            except Exception:
-                rendered_path = None
-
-        db_cert = models.Certificate(
-            id=cert_id, student_name=student_name, course_name=course_name,
-            cert_type=cert_type, data_payload=oa_doc, signature=sig,
-            claim_pin=claim_pin, organization=organization, batch_id=batch_id,
-            template_type="pdf" if use_pdf else "html",
-            rendered_pdf_path=rendered_path,
-            signing_status="unsigned"
-        )
-        db.add(db_cert)
-        issued_certs.append({"id": cert_id, "student_name": student_name, "course_name": course_name, "signing_status": "unsigned"})
 
-    db.commit()
+@app.post("/api/templates/bulk-issue")
+async def bulk_issue_from_template(
+    file: UploadFile = File(...),
+    force_reissue: bool = False,
+    signature_record_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Reads a CSV file and issues one certificate per row.
+    The previously uploaded template (user_templates/custom_certificate.html) is used.
+    CSV column names are mapped directly to the template's {{ placeholder }} names.
+    Required CSV columns: student_name, course_name (at minimum).
+    Rows that fail validation are listed under "errors" instead of being issued.
+    Rows issued by an earlier upload are skipped unless force_reissue is set.
+    With signature_record_id (PDF templates only) the certificates are rendered
+    with that record's signature and stamp and issued already signed.
+    """
+
+    if not file.filename.endswith(".csv"):
+        raise HTTPException(status_code=400, detail="Only CSV files are allowed")
+
+    # Determine which template to use
+    template = load_bulk_template()
+    if template is None:
+        raise HTTPException(status_code=400, detail="No template uploaded yet.")
+    use_pdf, pdf_template_path, template_fields = template
+    signer = get_issuance_signer(db, signature_record_id, use_pdf)
 
+    # Spool the upload to disk and stream its rows into issuance
+    path = await bulk_ingest.spool_upload(file, ".csv")
+    try:
+        with bulk_ingest.open_rows(path, "csv") as (headers, rows):
+            if not headers:
+                raise HTTPException(status_code=400, detail="CSV file is empty")
+            plan = compile_bulk_plan(headers, template_fields, ("course", "subject", "prog"), id_length=12)
+            result = issue_bulk_rows(db, rows, plan, use_pdf, pdf_template_path, force_reissue, signer)
+    finally:
+        os.remove(path)
+
+    if not (result["issued"] or result["skipped"] or result["rejected"]):
+        raise HTTPException(status_code=400, detail="CSV file is empty")
     db.commit()
-    return {
-        "message": f"{len(issued_certs)} certificates issued from template",
-        "count": len(issued_certs),
-        "certificates": issued_certs
-    }
+    return bulk_issue_response(f"{len(result['issued'])} certificates issued from template", plan, result)
 
 
 @app.post("/api/templates/bulk-issue-excel")
 async def bulk_issue_from_excel(
     file: UploadFile = File(...),
+    force_reissue: bool = False,
+    signature_record_id: Optional[int] = None,
     db: Session = Depends(get_db)
 ):
     """
     Reads an Excel (.xlsx) OR CSV file and issues one certificate per row.
-    Works the same as /api/templates/bulk-issue but supports Excel in addition to CSV.
+    Works the same as /api/templates/bulk-issue but supports Excel in addition to CSV,
+    including signing at issuance through signature_record_id.
     """
-    import re
     filename_lower = file.filename.lower()
     if not (filename_lower.endswith(".xlsx") or filename_lower.endswith(".csv")):
         raise HTTPException(status_code=400, detail="Only .xlsx or .csv files are allowed")
 
     # Determine which template to use
-    pdf_template_path = "user_templates/template.pdf"
-    html_template_path = "user_templates/custom_certificate.html"
-    use_pdf = os.path.exists(pdf_template_path)
-    use_html = os.path.exists(html_template_path)
+    template = load_bulk_template()
+    if template is None:
+        raise HTTPException(status_code=400, detail="No template uploaded. Upload a PDF or HTML template first.")
+    use_pdf, pdf_template_path, template_fields = template
+    signer = get_issuance_signer(db, signature_record_id, use_pdf)
 
-    if not use_pdf and not use_html:
+    # Spool the upload to disk and stream its rows into issuance
+    kind = "xlsx" if filename_lower.endswith(".xlsx") else "csv"
+    path = await bulk_ingest.spool_upload(file, "." + kind)
+    try:
+        with bulk_ingest.open_rows(path, kind) as (headers, rows):
+            if not headers:
+                raise HTTPException(status_code=400, detail="File is empty")
+            plan = compile_bulk_plan(headers, template_fields, BULK_EXCEL_COURSE_HINTS, id_length=8)
+            result = issue_bulk_rows(db, rows, plan, use_pdf, pdf_template_path, force_reissue, signer)
+    finally:
+        os.remove(path)
+
+    if not (result["issued"] or result["skipped"] or result["rejected"]):
+        raise HTTPException(status_code=400, detail="File is empty")
+    db.commit()
+    return bulk_issue_response(f"{len(result['issued'])} certificates issued", plan, result)
+
+
+BULK_JOB_EVENT_INTERVAL = float(os.getenv("BULK_JOB_EVENT_INTERVAL", "1"))
+
+@app.post("/api/bulk-jobs", status_code=202)
+async def create_bulk_job(
+    file: UploadFile = File(...),
+    force_reissue: bool = False,
+    signature_record_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Queues an Excel (.xlsx) or CSV file for background issuance and returns its job id
+    right away. Rows are issued in committed chunks; follow progress through
+    /api/bulk-jobs/{job_id} or the server-sent events at /api/bulk-jobs/{job_id}/events.
+    signature_record_id signs the certificates at issuance, as in /api/templates/bulk-issue.
+    """
+    filename_lower = file.filename.lower()
+    if not (filename_lower.endswith(".xlsx") or filename_lower.endswith(".csv")):
+        raise HTTPException(status_code=400, detail="Only .xlsx or .csv files are allowed")
+
+    template = load_bulk_template()
+    if template is None:
         raise HTTPException(status_code=400, detail="No template uploaded. Upload a PDF or HTML template first.")
+    use_pdf, pdf_template_path, template_fields = template
+    get_issuance_signer(db, signature_record_id, use_pdf)
 
-    template_path = pdf_template_path if use_pdf else html_template_path
-    if use_pdf:
-        # USE ROBUST PDF EXTRACTION
-        placeholder_map = pdf_utils.extract_pdf_placeholders(template_path)
-        template_fields = set(placeholder_map.keys())
-    else:
-        with open(template_path, "r", encoding="utf-8") as tf:
-            template_text = tf.read()
-        template_fields = set(re.findall(r"\{\{\s*([\w\s]+?)\s*\}\}", template_text))
-        template_fields = {f.strip() for f in template_fields}
+    kind = "xlsx" if filename_lower.endswith(".xlsx") else "csv"
+    path = await bulk_ingest.spool_upload(file, "." + kind)
+    try:
+        with bulk_ingest.open_rows(path, kind) as (headers, _):
+            pass
+        if not headers:
+            raise HTTPException(status_code=400, detail="File is empty")
+        # Fail fast on unusable headers; the job compiles the same plan when it runs
+        compile_bulk_plan(headers, template_fields, BULK_EXCEL_COURSE_HINTS, id_length=8)
+        job = bulk_jobs.create_job(db, path, file.filename, kind, template_fields, use_pdf, pdf_template_path,
+                                   course_hints=BULK_EXCEL_COURSE_HINTS, id_length=8, force_reissue=force_reissue,
+                                   signature_record_id=signature_record_id)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+    db.commit()
+    bulk_jobs.submit(job.id)
+    return bulk_jobs.progress(job)
+
+def get_bulk_job_or_404(db: Session, job_id: str) -> models.BulkJob:
+    job = db.query(models.BulkJob).filter(models.BulkJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Bulk job not found")
+    return job
+
+@app.get("/api/bulk-jobs/{job_id}")
+def get_bulk_job(job_id: str, db: Session = Depends(get_db)):
+    job = get_bulk_job_or_404(db, job_id)
+    return {**bulk_jobs.progress(job), "errors": job.error_report or []}
+
+@app.post("/api/bulk-jobs/{job_id}/retry", status_code=202)
+def retry_bulk_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(require_admin)
+):
+    """Resume a failed job from the rows it had already committed."""
+    job = get_bulk_job_or_404(db, job_id)
+    try:
+        bulk_jobs.retry(job)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    db.commit()
+    bulk_jobs.submit(job.id)
+    return bulk_jobs.progress(job)
 
-    # Parse the file
-    content_bytes = await file.read()
-    raw_rows = []
-    if filename_lower.endswith(".xlsx"):
-        import openpyxl
-        wb = openpyxl.load_workbook(BytesIO(content_bytes))
-        ws = wb.active
-        headers = [str(cell.value).strip() if cell.value else "" for cell in next(ws.iter_rows(min_row=1, max_row=1))]
-        for row in ws.iter_rows(min_row=2, values_only=True):
-            raw_rows.append({headers[i]: (str(v).strip() if v is not None else "") for i, v in enumerate(row)})
-    else:
-        content_str = content_bytes.decode("utf-8", errors="ignore")
-        csv_reader = csv.DictReader(io.StringIO(content_str))
-        raw_rows = list(csv_reader)
+@app.delete("/api/bulk-jobs/{job_id}")
+def delete_bulk_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(require_admin)
+):
+    """Remove a completed or failed job and its spooled upload."""
+    job = get_bulk_job_or_404(db, job_id)
+    try:
+        bulk_jobs.delete(db, job)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    db.commit()
+    return {"deleted": job_id}
 
-    if not raw_rows:
-        raise HTTPException(status_code=400, detail="File is empty")
-    
-    rows = raw_rows
-    headers = list(rows[0].keys())
-    name_col = next((h for h in headers if normalize_column_name(h) == "student_name"), None)
-    if not name_col:
-        name_col = next((h for h in headers if "name" in h.lower() or "roll" in h.lower() or "id" in h.lower()), None)
-
-    course_col = next((h for h in headers if normalize_column_name(h) == "course_name"), None)
-    if not course_col:
-        course_col = next((h for h in headers if "course" in h.lower() or "subject" in h.lower() or "prog" in h.lower() or "cent" in h.lower()), None)
-
-    issued_certs = []
-    system_auto = {"issued_at", "cert_id", "signature", "qr_code", "digital_signature", "stamp"}
-    os.makedirs("generated_certs", exist_ok=True)
+@app.get("/api/bulk-jobs/{job_id}/events")
+async def stream_bulk_job_events(job_id: str, db: Session = Depends(get_db)):
+    """Server-sent events: one progress snapshot per interval until the job completes or fails."""
+    get_bulk_job_or_404(db, job_id)
 
-    for row in rows:
-        student_name = row.get(name_col, "").strip() if name_col else "Student"
-        course_name = row.get(course_col, "").strip() if course_col else "Course"
-        
-        # Build data_payload: Match template placeholders to row keys (case-insensitive)
-        data_payload_fields = {}
-        row_keys_lower = {k.lower(): k for k in row.keys()}
-        for field in template_fields:
-            if field in system_auto: continue
-            f_lower = field.lower()
-            if f_lower in row_keys_lower:
-                data_payload_fields[field] = row[row_keys_lower[f_lower]].strip()
-
-        cert_type = row.get("cert_type", "certificate").strip() or "certificate"
-        organization = row.get("organization", "EduCerts Academy").strip() or "EduCerts Academy"
-
-        raw_data = {
-            "id": str(uuid.uuid4())[:8],
-            "type": cert_type,
-            "name": course_name,
-            "issuedOn": datetime.datetime.now().isoformat(),
-            "recipient": {"name": student_name, "studentId": row.get("student_id", "N/A")},
-            **{k: v for k, v in data_payload_fields.items() if k not in ("student_id", "organization")}
-        }
-        issuers = [{"name": organization, "url": "https://educerts.io",
-                    "documentStore": "0x007d40224f6562461633ccfbaffd359ebb2fc9ba",
-                    "identityProof": {"type": "DNS-TXT", "location": "educerts.io"}}]
-
-        oa_doc = oa_logic.wrap_document(raw_data, issuers=issuers)
-        merkle_root = oa_doc["signature"]["merkleRoot"]
-        sig = crypto_utils.sign_data(merkle_root)
-        oa_doc["signature"]["signature"] = sig
-        oa_doc["signature"]["publicKey"] = crypto_utils.get_public_key_pem()
-
-        batch_id = str(uuid.uuid4())
-        db.add(models.DocumentRegistry(id=batch_id, merkle_root=merkle_root,
-                                       issuer_name="EduCerts Admin", organization=organization, cert_count=1))
-
-        claim_pin = "".join([str(random.randint(0, 9)) for _ in range(6)])
-        cert_id = str(uuid.uuid4())
-
-        # Render PDF if PDF template exists
-        rendered_path = None
-        if use_pdf:
-            issued_at = datetime.datetime.now().strftime("%Y-%m-%d")
-            field_values = {
-                "student_name": student_name,
-                "course_name": course_name,
-                "issued_at": issued_at,
-                "cert_id": cert_id,
-                "signature": sig[:20] + "...",
-                **data_payload_fields
-            }
-            out_path = f"generated_certs/{cert_id}_base.pdf"
+    async def events():
+        while True:
+            # A fresh session per tick, so each snapshot sees the worker's latest commit
+            tick_db = database.SessionLocal()
             try:
-                print(f"DEBUG: Rendering PDF for cert {cert_id}...")
-                pdf_utils.render_pdf_certificate(pdf_template_path, field_values, out_path)
-                rendered_path = out_path
-                print(f"DEBUG: PDF rendered successfully: {out_path}")
-            except Exception as e:
-                import traceback
-                print(f"DEBUG: PDF RENDER ERROR: {e}")
-                traceback.print_exc()
-                rendered_path = None
-
-        db_cert = models.Certificate(
-            id=cert_id, student_name=student_name, course_name=course_name,
-            cert_type=cert_type, data_payload=oa_doc, signature=sig,
-            claim_pin=claim_pin, organization=organization, batch_id=batch_id,
-            template_type="pdf" if use_pdf else "html",
-            rendered_pdf_path=rendered_path,
-            signing_status="unsigned"
-        )
-        db.add(db_cert)
-        issued_certs.append({"id": cert_id, "student_name": student_name,
-                              "course_name": course_name, "signing_status": "unsigned"})
+                snapshot = bulk_jobs.progress(get_bulk_job_or_404(tick_db, job_id))
+            finally:
+                tick_db.close()
+            yield f"event: progress\ndata: {json.dumps(snapshot)}\n\n"
+            if snapshot["status"] in bulk_jobs.FINISHED:
+                return
+            await asyncio.sleep(BULK_JOB_EVENT_INTERVAL)
 
-    db.commit()
-    return {
-        "message": f"{len(issued_certs)} certificates issued",
-        "count": len(issued_certs),
-        "certificates": issued_certs
-    }
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -946,35 +1162,51 @@ async def apply_digital_signatures(
 
     os.makedirs("generated_certs", exist_ok=True)
     signed_certs = []
+    failed = []
     now_iso = datetime.datetime.now().isoformat()
 
+    certs = []
+    sign_jobs = []  # PDF certificates, signed together on the render pool
     for cert_id in cert_ids:
         cert = db.query(models.Certificate).filter(models.Certificate.id == cert_id).first()
         if not cert:
             continue
-
+        certs.append(cert)
+        if cert.template_type != "pdf":
+            continue
+        signed_pdf_path = f"generated_certs/{cert.id}_signed.pdf"
+        has_render = bool(cert.rendered_pdf_path) and os.path.exists(cert.rendered_pdf_path)
+        if has_render and cert.layout_manifest:
+            # Stamp the render's own image slots: no template needed, and a later
+            # template upload cannot misplace them
+            sign_jobs.append((cert.id, cert.rendered_pdf_path, signed_pdf_path, cert.layout_manifest))
+        elif has_pdf_template:
+            base_path = cert.rendered_pdf_path if has_render else pdf_template_path
+            sign_jobs.append((cert.id, base_path, signed_pdf_path, None))
+
+    render_stats = None
+    sign_results = {}
+    if sign_jobs:
+        results = await run_in_threadpool(render_pool.sign_many, pdf_template_path, sign_jobs, sig_path, stamp_path)
+        sign_results = {r["cert_id"]: r for r in results}
+        render_stats = render_pool.summarize(results)
+        thumbnails.submit([r["output_path"] for r in results])
+
+    for cert in certs:
+        cert_id = cert.id
         signed_pdf_path = f"generated_certs/{cert_id}_signed.pdf"
 
-        if cert.template_type == "pdf" and has_pdf_template:
-            base_path = cert.rendered_pdf_path or pdf_template_path
-            if not os.path.exists(base_path):
-                base_path = pdf_template_path
-            try:
-                pdf_utils.apply_signatures_to_pdf(
-                    pdf_path=base_path,
-                    signature_img_path=sig_path,
-                    stamp_img_path=stamp_path,
-                    template_path=pdf_template_path,
-                    output_path=signed_pdf_path
-                )
-                cert.rendered_pdf_path = signed_pdf_path
-            except Exception as e:
-                print(f"Signing error for {cert_id}: {e}")
+        if cert_id in sign_results:
+            signed = sign_results[cert_id]
+            if signed["error"]:
+                print(f"Signing error for {cert_id}: {signed['error']}")
+                failed.append({"id": cert_id, "error": signed["error"]})
                 continue
+            cert.rendered_pdf_path = signed["output_path"]
         else:
             # HTML-based cert — re-render with signature embedded
             verify_url = f"{FRONTEND_URL}/verify?id={cert.id}"
-            qr_b64 = generate_qr_base64(verify_url)
+            qr_b64 = certificate_fields.generate_qr_base64(verify_url)
             html_template_path = "user_templates/custom_certificate.html"
             if os.path.exists(html_template_path):
                 from jinja2 import FileSystemLoader, Environment
@@ -999,7 +1231,8 @@ async def apply_digital_signatures(
             cert.rendered_pdf_path = signed_pdf_path
 
         # Update signing metadata
-        existing_sigs = cert.digital_signatures or []
+        # A new list: appending to the loaded one in place is not seen as a change
+        existing_sigs = list(cert.digital_signatures or [])
         existing_sigs.append({
             "signer_name": signer_name,
             "signer_role": signer_role,
@@ -1012,7 +1245,9 @@ async def apply_digital_signatures(
     db.commit()
     return {
         "message": f"{len(signed_certs)} certificates signed",
-        "signed": signed_certs
+        "signed": signed_certs,
+        "failed": failed,
+        "render_stats": render_stats
     }
 
 
@@ -1089,81 +1324,27 @@ async def import_data(file: UploadFile = File(...)):
     data = [row for row in csv_reader if "student_name" in row and "course_name" in row]
     return {"message": "Data imported successfully", "count": len(data), "data": data}
 
-@app.get("/api/download/{cert_id}")
-def download_certificate(cert_id: str, db: Session = Depends(get_db)):
-    cert = db.query(models.Certificate).filter(models.Certificate.id == cert_id).first()
-    if not cert:
-        raise HTTPException(status_code=404, detail="Certificate not found")
-
-    # ── If a rendered/signed PDF already exists, serve it directly ──
-    if cert.rendered_pdf_path and os.path.exists(cert.rendered_pdf_path):
-        return FileResponse(
-            path=cert.rendered_pdf_path,
-            media_type="application/pdf",
-            filename=f"cert_{cert.id}.pdf"
-        )
-
-    # ── PDF template path ──
-    pdf_template_path = "user_templates/template.pdf"
-    if cert.template_type == "pdf" and os.path.exists(pdf_template_path):
-        # Render on-the-fly from PDF template
-        verify_url = f"{FRONTEND_URL}/verify?id={cert.id}"
-        qr_b64 = generate_qr_base64(verify_url)
-        field_values = {
-            "student_name": cert.student_name,
-            "course_name": cert.course_name,
-            "issued_at": cert.issued_at.strftime("%Y-%m-%d"),
-            "cert_id": cert.id,
-            "signature": cert.signature[:20] + "...",
-            "qr_code": qr_b64,
-        }
-        # Also overlay payload fields - ROBUST EXTRACTION
-        payload_data = cert.data_payload or {}
-        # Try both direct payload and OA 'data' nested payload
-        candidates = [payload_data, payload_data.get("data", {})]
-        
-        for source in candidates:
-            if not isinstance(source, dict): continue
-            for k, v in source.items():
-                # OA might have values like {"value": "John"} or just "John"}
-                if isinstance(v, dict) and "value" in v:
-                    field_values.setdefault(k, v["value"])
-                elif isinstance(v, (str, int, float)):
-                    field_values.setdefault(k, v)
-                elif isinstance(v, dict):
-                    # Check nested objects like recipient.name
-                    for subk, subv in v.items():
-                        if isinstance(subv, (str, int, float)):
-                            field_values.setdefault(f"{k}_{subk}", subv)
-                            field_values.setdefault(subk, subv)
-
-        print(f"DEBUG: On-the-fly field values: {list(field_values.keys())}")
-        os.makedirs("generated_certs", exist_ok=True)
-        out_path = f"generated_certs/{cert.id}_base.pdf"
-        try:
-            pdf_utils.render_pdf_certificate(pdf_template_path, field_values, out_path)
-        except Exception as e:
-            import traceback
-            traceback.print_exc()
-            raise HTTPException(status_code=500, detail=f"PDF render error: {e}")
+def certificate_field_values(cert: models.Certificate, placeholder_map: dict | None = None) -> dict:
+    """Values overlaid on the PDF template (see certificate_fields.pdf_field_values)."""
+    return certificate_fields.pdf_field_values(cert.id, cert.student_name, cert.course_name, cert.issued_at,
+                                               cert.signature, cert.data_payload, placeholder_map)
 
-        # Save the rendered path for next time
-        cert.rendered_pdf_path = out_path
-        db.commit()
 
-        return FileResponse(
-            path=out_path,
-            media_type="application/pdf",
-            filename=f"cert_{cert.id}.pdf"
-        )
+def issuance_render_matches(cert: models.Certificate, template_sha256: str, field_values: dict) -> bool:
+    """
+    Whether the render made at issuance is the one the template would give now:
+    same template bytes and same field values, as recorded in its layout manifest.
+    """
+    manifest = cert.layout_manifest or {}
+    return (bool(cert.rendered_pdf_path) and os.path.exists(cert.rendered_pdf_path)
+            and manifest.get("template_sha256") == template_sha256
+            and manifest.get("values_sha256") == render_cache.values_hash(field_values))
 
-    # ── Fallback: HTML template → xhtml2pdf ──
-    # ONLY if it's not a PDF template. If it's a PDF template and we are here, something is wrong.
-    if cert.template_type == "pdf":
-        raise HTTPException(status_code=500, detail="PDF template was requested but rendering failed or template is missing.")
 
+def render_html_certificate(cert: models.Certificate) -> bytes:
+    """PDF bytes of a certificate rendered from the HTML template with xhtml2pdf."""
     verify_url = f"{FRONTEND_URL}/verify?id={cert.id}"
-    qr_base64 = generate_qr_base64(verify_url)
+    qr_base64 = certificate_fields.generate_qr_base64(verify_url)
 
     custom_template_path = "user_templates/custom_certificate.html"
     if os.path.exists(custom_template_path):
@@ -1202,13 +1383,234 @@ def download_certificate(cert_id: str, db: Session = Depends(get_db)):
     pdf = pisa.pisaDocument(BytesIO(html_content.encode("utf-8")), result)
     if pdf.err:
         raise HTTPException(status_code=500, detail="Error generating PDF")
+    return result.getvalue()
 
+
+def certificate_pdf_path(cert: models.Certificate) -> tuple:
+    """
+    (path, content_addressed) of the PDF /api/download serves for cert: its signed
+    PDF, the render made at issuance while it matches the current PDF template and
+    field values, else the render-cache entry of those, or the render made at
+    issuance once the template is gone. (None, False) for HTML certificates, which
+    are rendered per request.
+    """
+    has_render = bool(cert.rendered_pdf_path) and os.path.exists(cert.rendered_pdf_path)
+
+    # ── A signed PDF is the certificate's document of record: serve it as is ──
+    if cert.signing_status == "signed" and has_render:
+        return cert.rendered_pdf_path, False
+
+    # ── PDF template path ──
+    pdf_template_path = "user_templates/template.pdf"
+    if cert.template_type == "pdf" and os.path.exists(pdf_template_path):
+        # Render on-the-fly from PDF template, through the render cache: keyed by
+        # the template's content and the field values, so it is never stale
+        template_sha, placeholder_map, _ = pdf_utils.load_template_with_hash(pdf_template_path)
+        field_values = certificate_field_values(cert, placeholder_map)
+        if issuance_render_matches(cert, template_sha, field_values):
+            return cert.rendered_pdf_path, False
+        try:
+            return render_cache.cache.get_or_render(pdf_template_path, field_values), True
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            raise HTTPException(status_code=500, detail=f"PDF render error: {e}")
+
+    if cert.template_type == "pdf" and has_render:
+        # The template is gone, so the render made at issuance is the only copy left
+        return cert.rendered_pdf_path, False
+    if cert.template_type == "pdf":
+        raise HTTPException(status_code=500, detail="PDF template was requested but rendering failed or template is missing.")
+    return None, False
+
+@app.get("/api/download/{cert_id}")
+def download_certificate(cert_id: str, db: Session = Depends(get_db)):
+    cert = db.query(models.Certificate).filter(models.Certificate.id == cert_id).first()
+    if not cert:
+        raise HTTPException(status_code=404, detail="Certificate not found")
+
+    path, _ = certificate_pdf_path(cert)
+    if path:
+        return FileResponse(
+            path=path,
+            media_type="application/pdf",
+            filename=f"cert_{cert.id}.pdf"
+        )
+
+    # ── Fallback: HTML template → xhtml2pdf ──
     return Response(
-        content=result.getvalue(),
+        content=render_html_certificate(cert),
         media_type="application/pdf",
         headers={"Content-Disposition": f"attachment; filename=cert_{cert.id}.pdf"}
     )
 
+def certificate_thumbnail(cert: models.Certificate) -> str:
+    """Path of the thumbnail of the PDF /api/download serves for cert (see certificate_pdf_path)."""
+    path, content_addressed = certificate_pdf_path(cert)
+    if path and content_addressed:
+        # Cache entries never change, and hits touch their mtime: no staleness check
+        return thumbnails.get_or_make(path, thumbnails.thumbnail_path(path))
+    if path:
+        return thumbnails.for_pdf(path)
+
+    html_template_path = "user_templates/custom_certificate.html"
+    template_mtime = os.path.getmtime(html_template_path) if os.path.exists(html_template_path) else None
+    thumb_path = thumbnails.thumbnail_path(f"generated_certs/{cert.id}.pdf")
+    if thumbnails.is_current(thumb_path, template_mtime):
+        return thumb_path
+    os.makedirs("generated_certs", exist_ok=True)
+    return thumbnails.make(render_html_certificate(cert), thumb_path)
+
+@app.get("/api/thumbnail/{cert_id}")
+def get_certificate_thumbnail(cert_id: str, request: Request, db: Session = Depends(get_db)):
+    """
+    Low-resolution image of the certificate's first page, for listing pages.
+    Made once and stored next to its PDF. Served with an ETag and no-cache:
+    clients keep their copy and revalidate it (304) until the PDF changes,
+    e.g. when it is signed.
+    """
+    cert = db.query(models.Certificate).filter(models.Certificate.id == cert_id).first()
+    if not cert:
+        raise HTTPException(status_code=404, detail="Certificate not found")
+    try:
+        path = certificate_thumbnail(cert)
+        st = os.stat(path)
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Thumbnail error: {e}")
+
+    etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path=path, media_type=thumbnails.media_type(), headers=headers)
+
+@app.get("/api/render-cache")
+def get_render_cache_stats(current_user: models.User = Depends(require_admin)):
+    """Hit ratio, disk use and eviction counters of the download render cache."""
+    return render_cache.cache.stats()
+
+
+def export_sources(cert_ids: list):
+    """
+    Chunks of (cert_id, pdf, error) for batch_export, in cert_ids order.
+    Each certificate is exported as /api/download serves it: signed PDFs as
+    they are, PDF-template certificates from their issuance render while it
+    matches, else from the render cache (the misses of a chunk are rendered
+    together on the render pool), HTML certificates rendered inline.
+    """
+    pdf_template_path = "user_templates/template.pdf"
+    has_pdf_template = os.path.exists(pdf_template_path)
+    db = database.SessionLocal()
+    try:
+        for ids in bulk_ingest.chunked(cert_ids, batch_export.EXPORT_CHUNK_SIZE):
+            certs = {c.id: c for c in db.query(models.Certificate).filter(models.Certificate.id.in_(ids))}
+            if has_pdf_template:
+                template_sha, placeholder_map, _ = pdf_utils.load_template_with_hash(pdf_template_path)
+            sources = {}
+            to_render = []  # (cert_id, field values) rendered from the current template
+            for cert_id in ids:
+                cert = certs.get(cert_id)
+                has_render = cert is not None and bool(cert.rendered_pdf_path) and os.path.exists(cert.rendered_pdf_path)
+                if cert is None:
+                    sources[cert_id] = (None, "Certificate not found")
+                elif cert.signing_status == "signed" and has_render:
+                    sources[cert_id] = (cert.rendered_pdf_path, None)
+                elif cert.template_type == "pdf":
+                    if has_pdf_template:
+                        field_values = certificate_field_values(cert, placeholder_map)
+                        if issuance_render_matches(cert, template_sha, field_values):
+                            sources[cert_id] = (cert.rendered_pdf_path, None)
+                        else:
+                            to_render.append((cert_id, field_values))
+                    elif has_render:
+                        # The template is gone, so the render made at issuance is the only copy left
+                        sources[cert_id] = (cert.rendered_pdf_path, None)
+                    else:
+                        sources[cert_id] = (None, "PDF template is missing")
+                else:
+                    try:
+                        sources[cert_id] = (render_html_certificate(cert), None)
+                    except Exception as e:
+                        sources[cert_id] = (None, f"HTML render error: {getattr(e, 'detail', e)}")
+
+            if to_render:
+                rendered = render_cache.cache.get_or_render_many(
+                    pdf_template_path, [field_values for _, field_values in to_render])
+                for (cert_id, _), source in zip(to_render, rendered):
+                    sources[cert_id] = source
+
+            yield [(cert_id, *sources[cert_id]) for cert_id in ids]
+            db.expunge_all()
+    finally:
+        db.close()
+
+
+EXPORT_FORMATS = {
+    "zip": ("application/zip", batch_export.stream_zip),
+    "pdf": ("application/pdf", batch_export.stream_merged_pdf),
+}
+
+def export_response(cert_ids: list, export_format: str, name: str) -> StreamingResponse:
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    media_type, stream = EXPORT_FORMATS[export_format]
+    body = stream(export_sources(cert_ids))
+    # Produce the first bytes before answering, so an export without a single
+    # certificate is an error response rather than an empty 200
+    try:
+        first = next(body)
+    except StopIteration:
+        first = b""
+    except batch_export.NothingToExport as e:
+        raise HTTPException(status_code=422, detail={
+            "message": "No certificate could be exported",
+            "errors": [{"id": cert_id, "error": str(error)}
+                       for cert_id, error in e.errors[:bulk_mapping.MAX_REPORTED_ERRORS]],
+        })
+    return StreamingResponse(itertools.chain([first], body), media_type=media_type,
+                             headers={"Content-Disposition": f"attachment; filename={name}.{export_format}"})
+
+
+@app.get("/api/batches/{batch_id}/export")
+def export_batch(
+    batch_id: str,
+    format: str = "zip",
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(require_admin)
+):
+    """
+    Stream every live certificate of a batch as a ZIP of PDFs (format=zip)
+    or as one merged PDF (format=pdf).
+    """
+    cert_ids = [cert_id for (cert_id,) in db.query(models.Certificate.id).filter(
+        models.Certificate.batch_id == batch_id,
+        models.Certificate.revoked == False
+    ).order_by(models.Certificate.issued_at, models.Certificate.id)]
+    if not cert_ids:
+        raise HTTPException(status_code=404, detail="Batch not found or has no live certificates")
+    return export_response(cert_ids, format, f"batch_{batch_id}")
+
+
+@app.post("/api/certificates/export")
+def export_certificates(
+    body: dict,
+    current_user: models.User = Depends(require_admin)
+):
+    """
+    Stream the given certificates as a ZIP or merged PDF.
+    Body: {"cert_ids": [...], "format": "zip" | "pdf"}
+    Unknown ids are listed in the ZIP's errors.txt.
+    """
+    cert_ids = body.get("cert_ids")
+    if not isinstance(cert_ids, list) or not cert_ids or not all(isinstance(i, str) for i in cert_ids):
+        raise HTTPException(status_code=400, detail="cert_ids must be a non-empty list of certificate ids")
+    return export_response(list(dict.fromkeys(cert_ids)), body.get("format", "zip"), "certificates")
+
+
 @app.get("/api/json/{cert_id}")
 def download_json_certificate(cert_id: str, db: Session = Depends(get_db)):
     cert = db.query(models.Certificate).filter(models.Certificate.id == cert_id).first()
@@ -1,5 +1,6 @@
 import models
 import database
+import claim_codes
 from sqlalchemy import text, inspect
 
 def run_migrations():
@@ -20,6 +21,17 @@ def run_migrations():
         ("signing_status", "VARCHAR(20) DEFAULT 'unsigned'"),
         ("digital_signatures", "JSONB"),
         ("batch_id", "VARCHAR(36) REFERENCES document_registry(id)"),
+        ("target_hash", "VARCHAR(64)"),
+        ("row_fingerprint", "VARCHAR(64)"),
+        ("claim_pin_expires_at", "TIMESTAMP WITH TIME ZONE"),
+        ("layout_manifest", "JSONB"),
+    ]
+
+    new_indexes = [
+        "CREATE INDEX IF NOT EXISTS ix_certificates_target_hash ON certificates (target_hash)",
+        "CREATE INDEX IF NOT EXISTS ix_certificates_row_fingerprint ON certificates (row_fingerprint)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_certificates_org_claim_pin ON certificates (organization, claim_pin) "
+        "WHERE claim_pin IS NOT NULL",
     ]
     
     with engine.connect() as conn:
@@ -34,6 +46,38 @@ def run_migrations():
             else:
                 print(f"Column {col_name} already exists.")
 
+        bulk_job_columns = [c['name'] for c in inspector.get_columns('bulk_jobs')]
+        for col_name, col_type in (
+            ("signature_record_id", "INTEGER REFERENCES digital_signature_records(id)"),
+            ("render_stats", "JSONB"),
+        ):
+            if col_name not in bulk_job_columns:
+                print(f"Adding column {col_name} to bulk_jobs table...")
+                try:
+                    conn.execute(text(f"ALTER TABLE bulk_jobs ADD COLUMN {col_name} {col_type}"))
+                    conn.commit()
+                except Exception as e:
+                    print(f"Error adding {col_name}: {e}")
+
+        # Claim PINs used to be drawn without a uniqueness check
+        db = database.SessionLocal()
+        try:
+            reassigned = claim_codes.reassign_duplicates(db)
+            db.commit()
+            print(f"Reassigned {reassigned} duplicate claim PINs.")
+        except Exception as e:
+            db.rollback()
+            print(f"Error reassigning duplicate claim PINs: {e}")
+        finally:
+            db.close()
+
+        for ddl in new_indexes:
+            try:
+                conn.execute(text(ddl))
+                conn.commit()
+            except Exception as e:
+                print(f"Error creating index: {e}")
+
     print("Migration finished!")
 
 if __name__ == "__main__":
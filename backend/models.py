@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, JSON, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -23,8 +23,11 @@ class Certificate(Base):
     cert_type = Column(String(50), default="certificate")
     data_payload = Column(JSON)
     signature = Column(Text)
+    target_hash = Column(String(64), nullable=True, index=True)  # OA targetHash; batch members share signature
+    row_fingerprint = Column(String(64), nullable=True, index=True)  # bulk upload row identity, for idempotent re-uploads
     organization = Column(String(200), default="EduCerts Academy")
-    claim_pin = Column(String(6), nullable=True)
+    claim_pin = Column(String(6), nullable=True)  # cleared once claimed or expired (see claim_codes.py)
+    claim_pin_expires_at = Column(DateTime(timezone=True), nullable=True)
     claimed = Column(Boolean, default=False)
     issued_at = Column(DateTime(timezone=True), server_default=func.now())
     revoked = Column(Boolean, default=False)
@@ -33,6 +36,7 @@ class Certificate(Base):
     # ── Template & PDF fields ──
     template_type = Column(String(10), default="html")  # "html" or "pdf"
     rendered_pdf_path = Column(String(500), nullable=True)  # path to the generated PDF file
+    layout_manifest = Column(JSON, nullable=True)  # template hash + image slots of the render, see pdf_utils.layout_manifest
 
     # ── Digital Signing fields ──
     signing_status = Column(String(20), default="unsigned")  # "unsigned" | "signed"
@@ -41,6 +45,12 @@ class Certificate(Base):
     student = relationship("User", back_populates="certificates")
     batch = relationship("DocumentRegistry", back_populates="certificates")
 
+    __table_args__ = (
+        # One live claim code per organization; cleared codes drop out of the index
+        Index("ux_certificates_org_claim_pin", "organization", "claim_pin", unique=True,
+              postgresql_where=text("claim_pin IS NOT NULL"), sqlite_where=text("claim_pin IS NOT NULL")),
+    )
+
 User.certificates = relationship("Certificate", back_populates="student")
 
 
@@ -73,3 +83,35 @@ class DigitalSignatureRecord(Base):
     signature_path = Column(String(500), nullable=True)  # path to signature PNG
     stamp_path = Column(String(500), nullable=True)       # path to stamp PNG
     uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class BulkJob(Base):
+    """
+    A bulk issuance upload processed in the background (see bulk_jobs.py).
+    processed_rows is committed together with each chunk of certificates,
+    so an interrupted job resumes from exactly where it stopped.
+    """
+    __tablename__ = "bulk_jobs"
+
+    id = Column(String(36), primary_key=True, index=True)
+    status = Column(String(20), default="queued", index=True)  # "queued" | "running" | "completed" | "failed"
+    filename = Column(String(255))
+    file_kind = Column(String(10))                               # "csv" | "xlsx"
+    file_path = Column(String(500))                              # spooled upload
+    template_path = Column(String(500), nullable=True)           # snapshot of the PDF template, if any
+    template_fields = Column(JSON)
+    course_hints = Column(JSON)                                  # see bulk_mapping.find_columns
+    id_length = Column(Integer, default=8)
+    force_reissue = Column(Boolean, default=False)
+    signature_record_id = Column(Integer, ForeignKey("digital_signature_records.id"), nullable=True)  # sign at issuance
+    total_rows = Column(Integer, nullable=True)
+    processed_rows = Column(Integer, default=0)
+    issued_count = Column(Integer, default=0)
+    skipped_count = Column(Integer, default=0)                   # rows already issued by an earlier upload
+    rejected_count = Column(Integer, default=0)
+    error_report = Column(JSON, nullable=True)                   # rejected rows and failed renders, capped at bulk_mapping.MAX_REPORTED_ERRORS
+    render_stats = Column(JSON, nullable=True)                   # PDF render totals, see bulk_jobs.progress
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
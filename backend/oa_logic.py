@@ -1,9 +1,13 @@
+import binascii
 import hashlib
 import json
 import uuid
 import secrets
 from typing import Dict, Any, List, Tuple
 
+SALT_BYTES = 16
+DIGEST_SIZE = 32  # SHA-256; internal hashes are kept as raw digests and hex-encoded at the API boundary
+
 def flatten_dict(d: Dict[str, Any], parent_key: str = '', sep: str = '.') -> Dict[str, Any]:
     """Flatten a nested dictionary for OA standard processing."""
     items = []
@@ -20,7 +24,7 @@ def salt_and_hash_field(key: str, value: Any) -> Tuple[str, str]:
     Apply OA-style salting and hashing to a single field.
     Format: hash(salt:key:value)
     """
-    salt = secrets.token_hex(16)
+    salt = secrets.token_hex(SALT_BYTES)
     # OA standard format often uses a specific string representation
     # We'll use a simplified version: salt:key:value
     # Cast value to string for consistent hashing
@@ -28,50 +32,150 @@ def salt_and_hash_field(key: str, value: Any) -> Tuple[str, str]:
     field_hash = hashlib.sha256(data_str.encode('utf-8')).hexdigest()
     return salt, field_hash
 
+def _bulk_salts(count: int) -> List[str]:
+    """Draw count hex salts from a single CSPRNG read instead of one call per field."""
+    width = SALT_BYTES * 2
+    pool = secrets.token_bytes(SALT_BYTES * count).hex()
+    return [pool[i:i + width] for i in range(0, width * count, width)]
+
 def salt_document(data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Takes a raw document and returns a salted version.
     The output is a dictionary where each value is replaced by { "salt": ..., "value": ... }
     """
     flattened = flatten_dict(data)
-    salted_doc = {}
-    for key, value in flattened.items():
-        salt = secrets.token_hex(16)
-        salted_doc[key] = {
-            "salt": salt,
-            "value": value
-        }
-    return salted_doc
+    salts = _bulk_salts(len(flattened))
+    return {
+        key: {"salt": salt, "value": value}
+        for (key, value), salt in zip(flattened.items(), salts)
+    }
+
+def _field_digests(salted_doc: Dict[str, Dict[str, Any]]) -> bytes:
+    """
+    Raw SHA-256 digests of every salted field, sorted and packed into one
+    contiguous buffer of DIGEST_SIZE-byte leaves.
+    OA v2 style: hash(salt:key:value)
+    """
+    sha256 = hashlib.sha256
+    digests = [
+        sha256(f"{item['salt']}:{key}:{item['value']!s}".encode('utf-8')).digest()
+        for key, item in salted_doc.items()
+    ]
+    # Raw byte order is the same as the order of the hex strings
+    digests.sort()
+    return b"".join(digests)
+
+def _hex_nodes(packed: bytes) -> List[bytes]:
+    """Split a packed digest buffer into ASCII-hex nodes with a single hexlify call."""
+    hex_packed = binascii.hexlify(packed)
+    width = DIGEST_SIZE * 2
+    return [hex_packed[i:i + width] for i in range(0, len(hex_packed), width)]
+
+def _next_layer(nodes: List[bytes]) -> List[bytes]:
+    """
+    Hash one Merkle level: each parent is sha256(lo_hex + hi_hex) of a sorted pair,
+    and an odd last node is paired with itself. The caller's list is not modified.
+    """
+    if len(nodes) % 2 != 0:
+        nodes = nodes + [nodes[-1]]
+    sha256 = hashlib.sha256
+    hexlify = binascii.hexlify
+    pairs = iter(nodes)
+    return [hexlify(sha256(a + b if a < b else b + a).digest()) for a, b in zip(pairs, pairs)]
+
+def _merkle_levels(leaves: bytes) -> List[List[bytes]]:
+    """All levels of the tree over a packed leaf buffer, leaves first."""
+    levels = [_hex_nodes(leaves)]
+    while len(levels[-1]) > 1:
+        levels.append(_next_layer(levels[-1]))
+    return levels
+
+def _merkle_root_digest(leaves: bytes) -> bytes:
+    """Raw Merkle Root of a packed leaf buffer (b"" when there are no leaves)."""
+    nodes = _hex_nodes(leaves)
+    if not nodes:
+        return b""
+    while len(nodes) > 1:
+        nodes = _next_layer(nodes)
+    return binascii.unhexlify(nodes[0])
 
 def get_field_hashes(salted_doc: Dict[str, Dict[str, Any]]) -> List[str]:
     """Calculate hashes for each salted field."""
-    hashes = []
-    for key, item in salted_doc.items():
-        # OA v2 style: hash(salt:key:value)
-        data_str = f"{item['salt']}:{key}:{str(item['value'])}"
-        h = hashlib.sha256(data_str.encode('utf-8')).hexdigest()
-        hashes.append(h)
-    return sorted(hashes)
+    packed = _field_digests(salted_doc).hex()
+    width = DIGEST_SIZE * 2
+    return [packed[i:i + width] for i in range(0, len(packed), width)]
 
 def calculate_merkle_root(hashes: List[str]) -> str:
-    """Calculate the Merkle Root of a list of hashes."""
+    """Calculate the Merkle Root of a list of hashes. The input list is left untouched."""
     if not hashes:
         return ""
-    
-    current_layer = hashes
-    while len(current_layer) > 1:
-        next_layer = []
-        # If odd number of hashes, duplicate the last one
-        if len(current_layer) % 2 != 0:
-            current_layer.append(current_layer[-1])
-            
-        for i in range(0, len(current_layer), 2):
-            combined = sorted([current_layer[i], current_layer[i+1]])
-            combined_str = combined[0] + combined[1]
-            next_layer.append(hashlib.sha256(combined_str.encode('utf-8')).hexdigest())
-        current_layer = next_layer
-        
-    return current_layer[0]
+    return _merkle_root_digest(bytes.fromhex("".join(hashes))).hex()
+
+def get_document_root(salted_doc: Dict[str, Dict[str, Any]]) -> str:
+    """Merkle Root (targetHash) of a salted document, hex-encoded only at the end."""
+    return _merkle_root_digest(_field_digests(salted_doc)).hex()
+
+def get_merkle_proofs(hashes: List[str]) -> Tuple[str, List[List[str]]]:
+    """
+    Build a Merkle tree over the given leaves (order preserved) and return
+    the root together with the sibling path of every leaf.
+    Pairing matches calculate_merkle_root: sorted pairs, last node duplicated on odd layers.
+    """
+    if not hashes:
+        return "", []
+
+    levels = _merkle_levels(bytes.fromhex("".join(hashes)))
+    proofs: List[List[str]] = [[] for _ in hashes]
+    for depth, level in enumerate(levels[:-1]):
+        last = len(level) - 1
+        siblings = [node.decode('ascii') for node in level]
+        for leaf, proof in enumerate(proofs):
+            proof.append(siblings[min((leaf >> depth) ^ 1, last)])
+
+    return levels[-1][0].decode('ascii'), proofs
+
+def _combine_digests(a: bytes, b: bytes) -> bytes:
+    """Parent of two raw digests: hash of the sorted pair's hex strings, as in calculate_merkle_root."""
+    if b < a:
+        a, b = b, a
+    return hashlib.sha256(binascii.hexlify(a) + binascii.hexlify(b)).digest()
+
+def _walk_proof(target: bytes, proof: List[str]) -> bytes:
+    """Fold a sibling path onto a raw target digest. O(len(proof)) hashes."""
+    current = target
+    for sibling in proof:
+        current = _combine_digests(current, bytes.fromhex(sibling))
+    return current
+
+def calculate_root_from_proof(target_hash: str, proof: List[str]) -> str:
+    """Walk a sibling path from a target hash up to the Merkle Root it implies."""
+    return _walk_proof(bytes.fromhex(target_hash), proof).hex()
+
+def verify_merkle_proof(salted_data: Dict[str, Dict[str, Any]], target_hash: str, proof: List[str], merkle_root: str) -> bool:
+    """
+    OA proof verification:
+    1. The salted data must hash to target_hash
+    2. Walking proof from target_hash must arrive at merkle_root
+    Malformed hashes or proofs are reported as invalid rather than raised.
+    """
+    if not salted_data or not target_hash or not merkle_root:
+        return False
+    try:
+        target = bytes.fromhex(target_hash)
+        root = bytes.fromhex(merkle_root)
+        if _merkle_root_digest(_field_digests(salted_data)) != target:
+            return False
+        return _walk_proof(target, proof or []) == root
+    except (ValueError, TypeError, AttributeError):
+        return False
+
+def verify_document_integrity(oa_doc: Dict[str, Any]) -> bool:
+    """Integrity check of a wrapped document against its own signature block."""
+    sig_block = oa_doc.get("signature") or {}
+    merkle_root = sig_block.get("merkleRoot")
+    # Documents from before batch wrapping may omit targetHash; it then equals merkleRoot
+    target_hash = sig_block.get("targetHash") or merkle_root
+    return verify_merkle_proof(oa_doc.get("data") or {}, target_hash, sig_block.get("proof") or [], merkle_root)
 
 def wrap_document(data: Dict[str, Any], issuers: List[Dict[str, Any]], version: str = "2.1") -> Dict[str, Any]:
     """
@@ -89,8 +193,7 @@ def wrap_document(data: Dict[str, Any], issuers: List[Dict[str, Any]], version:
     }
     
     salted_data = salt_document(full_data)
-    field_hashes = get_field_hashes(salted_data)
-    merkle_root = calculate_merkle_root(field_hashes)
+    merkle_root = get_document_root(salted_data)
     
     return {
         "version": f"https://schema.opencerts.io/transcripts/{version}",
@@ -102,3 +205,29 @@ def wrap_document(data: Dict[str, Any], issuers: List[Dict[str, Any]], version:
             "merkleRoot": merkle_root
         }
     }
+
+def salt_and_hash_document(data: Dict[str, Any], issuers: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], str]:
+    """Per-document unit of batch wrapping: returns (salted_data, targetHash)."""
+    salted_data = salt_document({**data, "issuers": issuers})
+    return salted_data, get_document_root(salted_data)
+
+def make_batch_documents(salted_docs: List[Dict[str, Any]], target_hashes: List[str], version: str = "2.1") -> List[Dict[str, Any]]:
+    """
+    Anchor already salted and hashed documents under a single Merkle Root.
+    The target hashes become the leaves of one batch tree and every document
+    receives its sibling path in signature.proof.
+    """
+    batch_root, proofs = get_merkle_proofs(target_hashes)
+    return [
+        {
+            "version": f"https://schema.opencerts.io/transcripts/{version}",
+            "data": salted_data,
+            "signature": {
+                "type": "SHA3MerkleProof",
+                "targetHash": target_hash,
+                "proof": proof,
+                "merkleRoot": batch_root
+            }
+        }
+        for salted_data, target_hash, proof in zip(salted_docs, target_hashes, proofs)
+    ]
@@ -5,20 +5,67 @@ PDF template engine for EduCerts.
 
 Workflow:
   1. extract_pdf_placeholders(pdf_path)
-       → Scans every page for {{field}} patterns using PyMuPDF and pdfplumber.
+       → Scans every page for {{field}} patterns and form fields using PyMuPDF.
        → Returns: { "field_name": [(page_idx, x0, y0, x1, y1), ...] }
 
   2. render_pdf_certificate(template_path, field_values, output_path)
        → Overlays field values on top of extracted positions.
 
-  3. apply_signatures_to_pdf(...)
+  3. apply_images(pdf_path, placeholder_map, images, output_path)
        → Overlays images on top of reserved signature/stamp placeholders.
+
+Placeholder maps are cached (get_placeholder_map): a template is scanned
+once, when it is uploaded, and the map is stored next to it in
+<template>.placeholders.json together with the SHA-256 of the template's
+bytes. Renders look the map up in memory by content hash, so bulk
+issuance scans the template once instead of once per certificate.
+
+The template's bytes are pooled in memory under the same hash: each
+render opens the document from that buffer instead of reading the file,
+and render_loaded() renders any number of certificates against one loaded
+template (see render_pool).
+
+A layout manifest (make_layout_manifest) records where a rendered
+certificate takes its signature and stamp images; signing stamps those
+stored rectangles (apply_layout) without looking at the template again.
+
+Each signature/stamp image is embedded once per document; further
+occurrences reference the same image object. Output is written with the
+PDF_SAVE_PROFILE save options (see SAVE_PROFILES).
+
+Configuration (environment):
+  TEMPLATE_POOL_SIZE   templates kept in memory (default: 4)
+  PDF_SAVE_PROFILE     plain | compact | max (default: compact)
 """
 
+import bisect
+import hashlib
+import itertools
+import json
+import os
 import re
+import threading
+import uuid
+from collections import OrderedDict
 import fitz  # PyMuPDF
-import pdfplumber
-from pathlib import Path
+
+TEMPLATE_POOL_SIZE = int(os.getenv("TEMPLATE_POOL_SIZE", "4"))
+
+# Placeholders filled with images (signature/stamp) rather than text
+IMAGE_FIELDS = ("digital_signature", "stamp")
+
+# Options for fitz.Document.save of rendered and signed certificates:
+#   plain    write the document as is
+#   compact  drop unused objects, compact xrefs and deflate uncompressed streams
+#   max      also merge duplicate objects and sanitize content streams (slower)
+SAVE_PROFILES = {
+    "plain": {},
+    "compact": {"garbage": 3, "deflate": True},
+    "max": {"garbage": 4, "deflate": True, "deflate_images": True, "deflate_fonts": True, "clean": True},
+}
+PDF_SAVE_PROFILE = os.getenv("PDF_SAVE_PROFILE", "compact")
+if PDF_SAVE_PROFILE not in SAVE_PROFILES:
+    raise ValueError(f"PDF_SAVE_PROFILE must be one of {', '.join(SAVE_PROFILES)}, got {PDF_SAVE_PROFILE!r}")
 
 # More robust regex to handle potential line breaks or weird spacing inside {{ }}
 PLACEHOLDER_RE = re.compile(r"\{\{\s*([\w]+)\s*\}\}")
@@ -27,14 +74,14 @@ PLACEHOLDER_RE = re.compile(r"\{\{\s*([\w]+)\s*\}\}")
 # 1) Extract placeholders + their bounding boxes from a PDF template
 # ──────────────────────────────────────────────────────────────────
 
-def extract_pdf_placeholders(pdf_path: str) -> dict:
+def extract_pdf_placeholders(pdf_path: str | bytes) -> dict:
     """
-    Ultra-robust extraction of placeholders from:
+    Ultra-robust extraction of placeholders (pdf_path may also be PDF bytes) from:
     1. Text layer: {{field_name}}
     2. Interactive Form Fields (AcroForms): Field Names
     """
     result: dict[str, list] = {}
-    doc = fitz.open(pdf_path)
+    doc = fitz.open(stream=pdf_path, filetype="pdf") if isinstance(pdf_path, bytes) else fitz.open(pdf_path)
 
     for page_idx, page in enumerate(doc):
         # --- PASS 1: Interactive Form Fields (AcroForms) ---
@@ -51,40 +98,212 @@ def extract_pdf_placeholders(pdf_path: str) -> dict:
                 })
 
         # --- PASS 2: Text Layer ({{placeholder}}) ---
-        words = page.get_text("words")
+        # The plain text is much cheaper than the word list: skip pages without "{{"
+        textpage = page.get_textpage()
+        if "{{" not in textpage.extractText():
+            continue
+        words = page.get_text("words", textpage=textpage)
         if words:
-            full_text = ""
-            index_map = []
-            for w in words:
-                word_str = w[4]
-                for _ in range(len(word_str)):
-                    index_map.append(w)
-                full_text += word_str + " "
-                index_map.append(None)
+            # Words joined by single spaces; starts[i] is the offset of words[i]
+            texts = [w[4] for w in words]
+            full_text = " ".join(texts)
+            starts = list(itertools.accumulate((len(t) + 1 for t in texts[:-1]), initial=0))
 
             for match in PLACEHOLDER_RE.finditer(full_text):
                 field_name = match.group(1)
-                start, end = match.start(), match.end()
-                participating_words = [index_map[k] for k in range(start, end) if index_map[k] is not None]
-                
-                if participating_words:
-                    x0 = min(w[0] for w in participating_words)
-                    y0 = min(w[1] for w in participating_words)
-                    x1 = max(w[2] for w in participating_words)
-                    y1 = max(w[3] for w in participating_words)
-                    
-                    if field_name not in result:
-                        result[field_name] = []
-                    result[field_name].append({
-                        "type": "text_overlay",
-                        "page": page_idx,
-                        "rect": (x0, y0, x1, y1)
-                    })
+                # A match starts and ends inside a word, never on a separator
+                first = bisect.bisect_right(starts, match.start()) - 1
+                last = bisect.bisect_right(starts, match.end() - 1) - 1
+                participating_words = words[first:last + 1]
+
+                x0 = min(w[0] for w in participating_words)
+                y0 = min(w[1] for w in participating_words)
+                x1 = max(w[2] for w in participating_words)
+                y1 = max(w[3] for w in participating_words)
+
+                if field_name not in result:
+                    result[field_name] = []
+                result[field_name].append({
+                    "type": "text_overlay",
+                    "page": page_idx,
+                    "rect": (x0, y0, x1, y1)
+                })
 
     doc.close()
     return result
 
 
+# ──────────────────────────────────────────────────────────────────
+# 1b) Placeholder map cache, keyed by the template's content hash
+# ──────────────────────────────────────────────────────────────────
+
+_map_lock = threading.Lock()
+# sha256 of template bytes -> placeholder map
+_maps_by_hash: dict[str, dict] = {}
+# template path -> ((st_mtime_ns, st_size), sha256), to skip re-hashing unchanged files
+_path_hashes: dict[str, tuple] = {}
+# sha256 -> template bytes, least recently used first
+_template_pool: "OrderedDict[str, bytes]" = OrderedDict()
+# image path -> ((st_mtime_ns, st_size), bytes) of signature and stamp images
+_image_pool: "OrderedDict[str, tuple]" = OrderedDict()
+IMAGE_POOL_SIZE = 16
+
+
+def placeholder_sidecar_path(template_path: str) -> str:
+    return f"{template_path}.placeholders.json"
+
+
+def template_hash(template_path: str) -> str:
+    """SHA-256 of the template file's bytes."""
+    digest = hashlib.sha256()
+    with open(template_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _current_hash(template_path: str) -> str:
+    st = os.stat(template_path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    known = _path_hashes.get(template_path)
+    if known and known[0] == stamp:
+        return known[1]
+    sha = template_hash(template_path)
+    _path_hashes[template_path] = (stamp, sha)
+    return sha
+
+
+def content_hash(template_path: str) -> str:
+    """SHA-256 of the template, re-hashed only when the file's mtime or size changes."""
+    with _map_lock:
+        return _current_hash(template_path)
+
+
+def _read_sidecar(template_path: str, sha: str) -> dict | None:
+    try:
+        with open(placeholder_sidecar_path(template_path), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("sha256") != sha or not isinstance(data.get("placeholders"), dict):
+        return None
+    return data["placeholders"]
+
+
+def _write_sidecar(template_path: str, sha: str, placeholder_map: dict):
+    path = placeholder_sidecar_path(template_path)
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"sha256": sha, "placeholders": placeholder_map}, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"WARNING: could not write placeholder map for {template_path}: {e}")
+
+
+def get_placeholder_map(template_path: str) -> dict:
+    """
+    Placeholder map of a template, scanned at most once per template content.
+    Looked up in memory, then in the sidecar file, and only then extracted.
+    The returned dict is shared between callers and must not be modified.
+    """
+    with _map_lock:
+        sha = _current_hash(template_path)
+        placeholder_map = _maps_by_hash.get(sha)
+        if placeholder_map is not None:
+            return placeholder_map
+        placeholder_map = _read_sidecar(template_path, sha)
+        if placeholder_map is None:
+            placeholder_map = extract_pdf_placeholders(template_path)
+            _write_sidecar(template_path, sha, placeholder_map)
+        _maps_by_hash[sha] = placeholder_map
+        return placeholder_map
+
+
+def store_placeholder_map(template_path: str) -> dict:
+    """
+    Scan a newly uploaded template and store its map in the sidecar file,
+    replacing whatever was cached for the template that was there before.
+    """
+    with _map_lock:
+        previous = _path_hashes.pop(template_path, None)
+        if previous:
+            _maps_by_hash.pop(previous[1], None)
+            _template_pool.pop(previous[1], None)
+        sha = _current_hash(template_path)
+        placeholder_map = extract_pdf_placeholders(template_path)
+        _write_sidecar(template_path, sha, placeholder_map)
+        _maps_by_hash[sha] = placeholder_map
+        return placeholder_map
+
+
+def load_template_with_hash(template_path: str) -> tuple[str, dict, bytes]:
+    """
+    (SHA-256, placeholder map, template bytes), all taken from the same read
+    of the template, so they describe one content even if the file is being
+    replaced. The bytes come from the in-memory pool when already loaded.
+    """
+    with _map_lock:
+        sha = _current_hash(template_path)
+        data = _template_pool.get(sha)
+        if data is not None:
+            _template_pool.move_to_end(sha)
+    if data is None:
+        with open(template_path, "rb") as f:
+            data = f.read()
+        sha = hashlib.sha256(data).hexdigest()
+        with _map_lock:
+            _template_pool[sha] = data
+            while len(_template_pool) > max(TEMPLATE_POOL_SIZE, 1):
+                _template_pool.popitem(last=False)
+
+    with _map_lock:
+        placeholder_map = _maps_by_hash.get(sha)
+        if placeholder_map is None:
+            placeholder_map = _read_sidecar(template_path, sha)
+            if placeholder_map is None:
+                placeholder_map = extract_pdf_placeholders(data)
+                _write_sidecar(template_path, sha, placeholder_map)
+            _maps_by_hash[sha] = placeholder_map
+    return sha, placeholder_map, data
+
+
+def load_template(template_path: str) -> tuple[dict, bytes]:
+    """
+    (placeholder map, template bytes) from the in-memory pool, reading the
+    file only when its content has not been loaded yet.
+    """
+    _, placeholder_map, data = load_template_with_hash(template_path)
+    return placeholder_map, data
+
+
+def _load_image(path: str | None) -> bytes | None:
+    if not path:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _map_lock:
+        known = _image_pool.get(path)
+        if known and known[0] == stamp:
+            _image_pool.move_to_end(path)
+            return known[1]
+    with open(path, "rb") as f:
+        data = f.read()
+    with _map_lock:
+        _image_pool[path] = (stamp, data)
+        while len(_image_pool) > IMAGE_POOL_SIZE:
+            _image_pool.popitem(last=False)
+    return data
+
+
+def load_images(signature_img_path: str | None, stamp_img_path: str | None) -> dict:
+    """Signature and stamp image bytes by placeholder name (None when missing), read once per file."""
+    return {"digital_signature": _load_image(signature_img_path), "stamp": _load_image(stamp_img_path)}
+
+
 # ──────────────────────────────────────────────────────────────────
 # 2) Render a certificate PDF by overlaying values on the template
 # ──────────────────────────────────────────────────────────────────
@@ -99,30 +318,77 @@ def render_pdf_certificate(
     """
     Fills forms and overlays text/images on the PDF.
     """
-    placeholder_map = extract_pdf_placeholders(template_path)
-    doc = fitz.open(template_path)
-    IMAGE_FIELDS = {"digital_signature", "stamp"}
+    placeholder_map, template_bytes = load_template(template_path)
+    return render_loaded(template_bytes, placeholder_map, field_values, output_path,
+                         load_images(signature_img_path, stamp_img_path))
+
+
+def render_loaded(template_bytes: bytes, placeholder_map: dict, field_values: dict,
+                  output_path: str, images: dict) -> str:
+    """Render from an already loaded template (see load_template and load_images)."""
+    doc = fitz.open(stream=template_bytes, filetype="pdf")
+    try:
+        _fill_document(doc, placeholder_map, field_values, images)
+
+        # Flatten the form (makes it uneditable and professional)
+        doc.need_appearances(True) # Ensure values are visible
+        save_document(doc, output_path)
+    finally:
+        doc.close()
+    return output_path
+
+
+def save_document(doc, output_path: str, profile: str | None = None):
+    """Save with the options of a SAVE_PROFILES entry (default: PDF_SAVE_PROFILE)."""
+    doc.save(output_path, **SAVE_PROFILES[profile or PDF_SAVE_PROFILE])
+
+
+def _insert_image(page, rect, field_name: str, images: dict, image_xrefs: dict):
+    """Embed a field's image on first use, then reference the same xref."""
+    xref = image_xrefs.get(field_name)
+    if xref:
+        page.insert_image(rect, xref=xref)
+        return
+    image = images.get(field_name)
+    if image:
+        image_xrefs[field_name] = page.insert_image(rect, stream=image)
+
+
+def _fill_document(doc, placeholder_map: dict, field_values: dict, images: dict):
+    pages: dict[int, fitz.Page] = {}
+    # page index -> {field name: [widgets]}, built on first use
+    widget_index: dict[int, dict[str, list]] = {}
+    filled: set = set()  # (page index, field name) whose widgets are filled
+    image_xrefs: dict[str, int] = {}  # field name -> xref of its embedded image
 
     for field_name, occurrences in placeholder_map.items():
         value = field_values.get(field_name, "")
         is_image_field = field_name in IMAGE_FIELDS
 
         for occ in occurrences:
-            page = doc[occ["page"]]
+            page_idx = occ["page"]
+            page = pages.get(page_idx)
+            if page is None:
+                page = pages[page_idx] = doc[page_idx]
             rect = fitz.Rect(occ["rect"])
             
             if occ["type"] == "acroform":
                 # DO NOT erase for AcroForms - the widget will overlay naturally
-                # Fill the existing widget
-                for widget in page.widgets():
-                    if widget.field_name == field_name:
-                        if is_image_field:
-                            img_path = signature_img_path if field_name == "digital_signature" else stamp_img_path
-                            if img_path and Path(img_path).exists():
-                                page.insert_image(rect, filename=img_path)
-                        else:
-                            widget.field_value = str(value)
-                            widget.update()
+                if is_image_field:
+                    _insert_image(page, rect, field_name, images, image_xrefs)
+                    continue
+                # Fill the existing widgets, each one once
+                if (page_idx, field_name) in filled:
+                    continue
+                filled.add((page_idx, field_name))
+                by_name = widget_index.get(page_idx)
+                if by_name is None:
+                    by_name = widget_index[page_idx] = {}
+                    for widget in page.widgets():
+                        by_name.setdefault(widget.field_name, []).append(widget)
+                for widget in by_name.get(field_name, ()):
+                    widget.field_value = str(value)
+                    widget.update()
             else:
                 # --- ERASE THE PLACEHOLDER FOR TEXT LAYER ONLY ---
                 # We use overlay=True to draw on top of the text layer.
@@ -130,9 +396,7 @@ def render_pdf_certificate(
 
                 # Text overlay logic
                 if is_image_field:
-                    img_path = signature_img_path if field_name == "digital_signature" else stamp_img_path
-                    if img_path and Path(img_path).exists():
-                        page.insert_image(rect, filename=img_path)
+                    _insert_image(page, rect, field_name, images, image_xrefs)
                 else:
                     if value:
                         # Font size: cap at box height, default 11 for standard look
@@ -145,48 +409,65 @@ def render_pdf_certificate(
                             color=(0, 0, 0),
                         )
 
-    # Flatten the form (makes it uneditable and professional)
-    doc.need_appearances(True) # Ensure values are visible
-    # doc.save(output_path, incremental=False, encryption=fitz.PDF_ENCRYPT_KEEP)
-    doc.save(output_path)
-    doc.close()
-    return output_path
-
 
 # ──────────────────────────────────────────────────────────────────
 # 3) Apply signature/stamp to an *already-rendered* certificate PDF
 # ──────────────────────────────────────────────────────────────────
 
-def apply_signatures_to_pdf(
-    pdf_path: str,
-    signature_img_path: str | None,
-    stamp_img_path: str | None,
-    template_path: str,
-    output_path: str,
-) -> str:
+def apply_images(pdf_path: str, placeholder_map: dict, images: dict, output_path: str) -> str:
+    """Overlay already loaded images (see load_images) on their placeholders."""
+    return apply_layout(pdf_path, image_slots(placeholder_map), images, output_path)
+
+
+def apply_layout(pdf_path: str, slots: dict, images: dict, output_path: str) -> str:
     """
-    Applies images to an already rendered PDF.
+    Overlay already loaded images on the image slots of a layout manifest.
+    output_path may be pdf_path itself (a second signer on a signed PDF): the
+    result is saved to a temporary file and moved into place.
     """
-    placeholder_map = extract_pdf_placeholders(template_path)
     doc = fitz.open(pdf_path)
+    image_xrefs: dict[str, int] = {}
+    tmp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        for page_idx, fields in slots.items():
+            page = doc[int(page_idx)]
+            for field_name, rects in fields.items():
+                if not images.get(field_name):
+                    continue
+                for rect in rects:
+                    rect = fitz.Rect(rect)
+                    # Erase existing placeholder text/blank space
+                    page.draw_rect(rect, color=(1, 1, 1), fill=(1, 1, 1), overlay=True)
+                    _insert_image(page, rect, field_name, images, image_xrefs)
 
-    for field_name, occurrences in placeholder_map.items():
-        img_path = None
-        if field_name == "digital_signature":
-            img_path = signature_img_path
-        elif field_name == "stamp":
-            img_path = stamp_img_path
-        
-        if not img_path or not Path(img_path).exists():
-            continue
+        save_document(doc, tmp_path)
+        doc.close()
+        os.replace(tmp_path, output_path)
+    finally:
+        if not doc.is_closed:
+            doc.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return output_path
 
-        for occ in occurrences:
-            page = doc[occ["page"]]
-            rect = fitz.Rect(occ["rect"])
-            # Erase existing placeholder text/blank space
-            page.draw_rect(rect, color=(1, 1, 1), fill=(1, 1, 1), overlay=True)
-            page.insert_image(rect, filename=img_path)
 
-    doc.save(output_path)
-    doc.close()
-    return output_path
+# ──────────────────────────────────────────────────────────────────
+# 4) Layout manifests: image slots recorded per rendered certificate
+# ──────────────────────────────────────────────────────────────────
+
+def image_slots(placeholder_map: dict) -> dict:
+    """{page index (str): {image field: [[x0, y0, x1, y1], ...]}} of a placeholder map."""
+    slots: dict[str, dict] = {}
+    for field_name in IMAGE_FIELDS:
+        for occ in placeholder_map.get(field_name, ()):
+            slots.setdefault(str(occ["page"]), {}).setdefault(field_name, []).append(list(occ["rect"]))
+    return slots
+
+
+def make_layout_manifest(template_sha256: str, placeholder_map: dict) -> dict:
+    """
+    Layout manifest of certificates rendered from a template: its content hash
+    and the rectangles of its image fields, per page. Take both arguments from
+    one load_template_with_hash() so they describe the same template bytes.
+    """
+    return {"template_sha256": template_sha256, "image_slots": image_slots(placeholder_map)}
@@ -0,0 +1,187 @@
+"""
+registry_index.py
+─────────────────────────────────────────────────────────────────────
+In-memory index of the Document Registry for verification.
+
+  • a Bloom filter answers "definitely not anchored" without touching
+    the database, which is the common case for forged or tampered documents
+  • a hashed set of live (non-revoked) Merkle Roots gives the positive answer
+
+The index is loaded at startup and kept current through session events:
+registry rows added, revoked or deleted in a transaction are applied once
+that transaction commits, and discarded on rollback.
+
+The index lives in the process memory. When the API runs as several
+worker processes, each keeps its own copy and only sees commits made by
+that process. Run a single worker, or disable the index with
+REGISTRY_INDEX_ENABLED=0 so verification falls back to the database.
+
+Configuration (environment):
+  REGISTRY_INDEX_ENABLED       1/0 (default: 1)
+  REGISTRY_BLOOM_CAPACITY      expected number of roots (default: 100000)
+  REGISTRY_BLOOM_ERROR_RATE    target false-positive rate (default: 0.001)
+"""
+
+import hashlib
+import math
+import os
+import sys
+import threading
+
+from sqlalchemy import event
+
+import database
+import models
+
+REGISTRY_INDEX_ENABLED = os.getenv("REGISTRY_INDEX_ENABLED", "1") == "1"
+REGISTRY_BLOOM_CAPACITY = int(os.getenv("REGISTRY_BLOOM_CAPACITY", "100000"))
+REGISTRY_BLOOM_ERROR_RATE = float(os.getenv("REGISTRY_BLOOM_ERROR_RATE", "0.001"))
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings, using double hashing on one SHA-256."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.sha256(key.encode("utf-8")).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:16], "big") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def estimated_false_positive_rate(self) -> float:
+        """(1 - e^(-k·n/m))^k for the number of keys added so far."""
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+
+class RegistryIndex:
+    def __init__(self):
+        self.loaded = False
+        self._lock = threading.Lock()
+        self._live: set[str] = set()
+        self._bloom = BloomFilter(REGISTRY_BLOOM_CAPACITY, REGISTRY_BLOOM_ERROR_RATE)
+        self._negatives = 0       # answered by the Bloom filter alone
+        self._positives = 0
+        # Bloom filter said "maybe", live set said no. Includes revoked roots,
+        # which the filter cannot forget until the next rebuild.
+        self._false_positives = 0
+
+    def load(self, db):
+        """(Re)build the index from all non-revoked registry entries."""
+        roots = [r for (r,) in db.query(models.DocumentRegistry.merkle_root).filter(
+            models.DocumentRegistry.revoked == False
+        ) if r]
+        with self._lock:
+            self._rebuild(roots)
+            self.loaded = True
+
+    def _rebuild(self, roots):
+        # Size for growth so the filter does not saturate right after startup
+        bloom = BloomFilter(max(REGISTRY_BLOOM_CAPACITY, 2 * len(roots)), REGISTRY_BLOOM_ERROR_RATE)
+        for root in roots:
+            bloom.add(root)
+        self._bloom = bloom
+        self._live = set(roots)
+
+    def add(self, merkle_root: str):
+        with self._lock:
+            if merkle_root in self._live:
+                return
+            self._live.add(merkle_root)
+            if self._bloom.count >= self._bloom.capacity:
+                self._rebuild(list(self._live))
+            else:
+                self._bloom.add(merkle_root)
+
+    def remove(self, merkle_root: str):
+        # Bloom filters cannot delete; the live set is what makes a revoked root negative
+        with self._lock:
+            self._live.discard(merkle_root)
+
+    def is_anchored(self, merkle_root: str) -> bool:
+        if merkle_root not in self._bloom:
+            self._negatives += 1
+            return False
+        if merkle_root in self._live:
+            self._positives += 1
+            return True
+        self._false_positives += 1
+        return False
+
+    def stats(self) -> dict:
+        with self._lock:
+            bloom = self._bloom
+            set_bytes = sys.getsizeof(self._live) + sum(sys.getsizeof(r) for r in self._live)
+            maybe = self._positives + self._false_positives
+            return {
+                "enabled": REGISTRY_INDEX_ENABLED,
+                "loaded": self.loaded,
+                "live_roots": len(self._live),
+                "bloom_bits": bloom.num_bits,
+                "bloom_hashes": bloom.num_hashes,
+                "bloom_capacity": bloom.capacity,
+                "memory_bytes": {
+                    "bloom_filter": len(bloom.bits),
+                    "live_set": set_bytes,
+                    "total": len(bloom.bits) + set_bytes,
+                },
+                "false_positive_rate": {
+                    "target": bloom.error_rate,
+                    "estimated": bloom.estimated_false_positive_rate(),
+                    "observed": (self._false_positives / maybe) if maybe else 0.0,
+                },
+                "lookups": {
+                    "bloom_negative": self._negatives,
+                    "positive": self._positives,
+                    "false_positive": self._false_positives,
+                },
+            }
+
+
+index = RegistryIndex()
+
+
+# ── Keep the index in step with committed registry changes ──
+
+@event.listens_for(database.SessionLocal, "after_flush")
+def _collect_registry_changes(session, flush_context):
+    changes = session.info.setdefault("registry_index_changes", [])
+    for obj in session.new:
+        if isinstance(obj, models.DocumentRegistry) and obj.merkle_root and not obj.revoked:
+            changes.append(("add", obj.merkle_root))
+    for obj in session.dirty:
+        if isinstance(obj, models.DocumentRegistry) and obj.merkle_root:
+            changes.append(("remove" if obj.revoked else "add", obj.merkle_root))
+    for obj in session.deleted:
+        if isinstance(obj, models.DocumentRegistry) and obj.merkle_root:
+            changes.append(("remove", obj.merkle_root))
+
+
+@event.listens_for(database.SessionLocal, "after_commit")
+def _apply_registry_changes(session):
+    for action, merkle_root in session.info.pop("registry_index_changes", []):
+        if action == "add":
+            index.add(merkle_root)
+        else:
+            index.remove(merkle_root)
+
+
+@event.listens_for(database.SessionLocal, "after_rollback")
+def _discard_registry_changes(session):
+    session.info.pop("registry_index_changes", None)
@@ -0,0 +1,219 @@
+"""
+render_cache.py
+─────────────────────────────────────────────────────────────────────
+Disk cache of PDFs rendered on the fly by /api/download.
+
+  • entries are content-addressed: <template hash>/<field values hash>.pdf,
+    so a render made from an older template can never be served
+  • uploading a new template drops the entries of every other template
+  • the total size is kept under a byte budget by LRU eviction; the LRU
+    order survives restarts through the files' mtimes (touched on hits)
+  • concurrent misses for the same entry render once
+  • get_or_render_many renders the misses of a whole list on render_pool
+
+Configuration (environment):
+  RENDER_CACHE_DIR         cache directory (default: render_cache)
+  RENDER_CACHE_MAX_BYTES   disk budget (default: 1 GiB)
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import pdf_utils
+import render_pool
+import thumbnails
+
+RENDER_CACHE_DIR = os.getenv("RENDER_CACHE_DIR", "render_cache")
+RENDER_CACHE_MAX_BYTES = int(os.getenv("RENDER_CACHE_MAX_BYTES", str(1024 ** 3)))
+
+
+def values_hash(field_values: dict) -> str:
+    canonical = json.dumps(field_values, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # "<template hash>/<values hash>" -> size in bytes, least recently used first
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._loaded = False
+        self._inflight: dict[str, Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def _load(self):
+        """Index the files already on disk, oldest first."""
+        if self._loaded:
+            return
+        found = []
+        if os.path.isdir(self.directory):
+            for template_dir in os.scandir(self.directory):
+                if not template_dir.is_dir():
+                    continue
+                for entry in os.scandir(template_dir.path):
+                    if entry.name.endswith(".pdf"):
+                        st = entry.stat()
+                        found.append((st.st_mtime, f"{template_dir.name}/{entry.name[:-4]}", st.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._bytes += size
+        self._loaded = True
+        self._evict()
+
+    def _remove(self, key: str):
+        self._bytes -= self._entries.pop(key)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+        thumbnails.discard(self._path(key))
+
+    def _evict(self):
+        # The newest entry stays even if it alone is over budget: it is about to be served
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def get_or_render(self, template_path: str, field_values: dict) -> str:
+        """Path of the cached render of field_values on the template, rendering it on a miss."""
+        # One load: the key's template hash is that of the bytes rendered on a miss
+        template_sha, placeholder_map, template_bytes = pdf_utils.load_template_with_hash(template_path)
+        key = f"{template_sha}/{values_hash(field_values)}"
+        path = self._path(key)
+        with self._lock:
+            self._load()
+            if key in self._entries and os.path.exists(path):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                os.utime(path)
+                return path
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                self.misses += 1
+                future = Future()
+                self._inflight[key] = future
+        if not owner:
+            return future.result()
+
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            try:
+                pdf_utils.render_loaded(template_bytes, placeholder_map, field_values, tmp_path, {})
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            size = os.path.getsize(path)
+        except BaseException as exc:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(exc)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            self._add(key, size)
+        future.set_result(path)
+        return path
+
+    def _add(self, key: str, size: int):
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)
+        self._entries[key] = size
+        self._bytes += size
+        self._evict()
+
+    def get_or_render_many(self, template_path: str, values_list: list) -> list:
+        """
+        (path, error) of the cached render of each field values dict, in order.
+        The misses are rendered together on the render pool.
+        """
+        template_sha = pdf_utils.content_hash(template_path)
+        keys = [f"{template_sha}/{values_hash(field_values)}" for field_values in values_list]
+        found = {}
+        misses = {}  # key -> field values, once per distinct key
+        with self._lock:
+            self._load()
+            for key, field_values in zip(keys, values_list):
+                path = self._path(key)
+                if key in found or key in misses:
+                    continue
+                if key in self._entries and os.path.exists(path):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    os.utime(path)
+                    found[key] = (path, None)
+                else:
+                    self.misses += 1
+                    misses[key] = field_values
+
+        if misses:
+            os.makedirs(os.path.join(self.directory, template_sha), exist_ok=True)
+            jobs = [(key, field_values, f"{self._path(key)}.{uuid.uuid4().hex}.tmp")
+                    for key, field_values in misses.items()]
+            for result, (key, _, tmp_path) in zip(render_pool.render_many(template_path, jobs), jobs):
+                if result["error"]:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    found[key] = (None, result["error"])
+                    continue
+                # The workers load the template themselves: if it was replaced since the
+                # hash above, file the render under the hash of the bytes it was made from
+                rendered_key = f"{result['layout']['template_sha256']}/{key.split('/', 1)[1]}"
+                path = self._path(rendered_key)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+                with self._lock:
+                    self._add(rendered_key, os.path.getsize(path))
+                found[key] = (path, None)
+        return [found[key] for key in keys]
+
+    def drop_other_templates(self, template_path: str) -> int:
+        """Remove every entry not rendered from the template's current content."""
+        current = pdf_utils.content_hash(template_path)
+        with self._lock:
+            self._load()
+            stale = [key for key in self._entries if not key.startswith(f"{current}/")]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+        if os.path.isdir(self.directory):
+            for template_dir in os.scandir(self.directory):
+                if template_dir.is_dir() and template_dir.name != current:
+                    shutil.rmtree(template_dir.path, ignore_errors=True)
+        return len(stale)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._load()
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+cache = RenderCache(RENDER_CACHE_DIR, RENDER_CACHE_MAX_BYTES)
@@ -0,0 +1,169 @@
+"""
+render_pool.py
+─────────────────────────────────────────────────────────────────────
+Process pool for PyMuPDF rendering: bulk issuance renders and batch signing.
+
+  render_many(template_path, jobs)          → jobs are (cert_id, field_values, output_path)
+  sign_many(template_path, jobs, sig, stamp) → jobs are (cert_id, pdf_path, output_path, layout)
+
+Jobs are sent to worker processes in chunks. Each worker keeps the
+template bytes, its placeholder map and the signature/stamp images in
+memory after its first chunk (pdf_utils pools them by content hash), so
+later chunks touch the disk only for their own output.
+
+Every job gets a result dict — {cert_id, output_path, error, ms} — in
+input order: a failed certificate is reported with its error instead of
+failing or silently shrinking the batch. summarize() turns the results
+into counts and latency percentiles.
+
+Renders also return the certificate's layout manifest. Signing jobs that
+carry one stamp its rectangles without loading the template at all.
+
+Small batches render inline, because a process round trip costs more
+than they do.
+
+Configuration (environment):
+  RENDER_POOL_WORKERS     number of worker processes (default: CPU count, 0/1 = inline only)
+  RENDER_POOL_CHUNK_SIZE  certificates sent to a worker per task (default: 16)
+  RENDER_POOL_MIN_JOBS    smallest batch worth sending to the pool (default: 32)
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pdf_utils
+
+RENDER_POOL_WORKERS = int(os.getenv("RENDER_POOL_WORKERS", str(os.cpu_count() or 1)))
+RENDER_POOL_CHUNK_SIZE = int(os.getenv("RENDER_POOL_CHUNK_SIZE", "16"))
+RENDER_POOL_MIN_JOBS = int(os.getenv("RENDER_POOL_MIN_JOBS", "32"))
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ProcessPoolExecutor | None:
+    """Shared executor, started lazily. None when the pool is disabled."""
+    global _pool
+    if RENDER_POOL_WORKERS <= 1:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a server process that already runs threads is not safe
+            _pool = ProcessPoolExecutor(
+                max_workers=RENDER_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+def _run_chunk(kind: str, template_path: str, signature_img_path: str | None,
+               stamp_img_path: str | None, jobs: list) -> list:
+    """Render or sign one chunk of jobs. Runs in a worker process or inline."""
+    template = None
+
+    def load():
+        nonlocal template
+        if template is None:
+            # One load: the manifest's hash is that of the bytes rendered
+            sha, placeholder_map, template_bytes = pdf_utils.load_template_with_hash(template_path)
+            template = (placeholder_map, template_bytes, pdf_utils.make_layout_manifest(sha, placeholder_map))
+        return template
+
+    try:
+        images = pdf_utils.load_images(signature_img_path, stamp_img_path)
+        if kind == "render":
+            load()
+    except Exception as e:
+        return [{"cert_id": job[0], "output_path": None, "error": f"Template load failed: {e}", "ms": 0.0}
+                for job in jobs]
+
+    results = []
+    for cert_id, source, output_path, *layout in jobs:
+        t0 = time.perf_counter()
+        result = {"cert_id": cert_id, "output_path": None, "error": None}
+        try:
+            if kind == "render":
+                placeholder_map, template_bytes, manifest = template
+                pdf_utils.render_loaded(template_bytes, placeholder_map, source, output_path, images)
+                result["layout"] = manifest
+            elif layout and layout[0]:
+                pdf_utils.apply_layout(source, layout[0]["image_slots"], images, output_path)
+            else:
+                # Rendered before layout manifests were stored: use the current template
+                pdf_utils.apply_images(source, load()[0], images, output_path)
+            result["output_path"] = output_path
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        result["ms"] = round((time.perf_counter() - t0) * 1000, 2)
+        results.append(result)
+    return results
+
+
+def _run(kind: str, template_path: str, signature_img_path: str | None,
+         stamp_img_path: str | None, jobs: list) -> list:
+    jobs = list(jobs)
+    pool = get_pool() if len(jobs) >= RENDER_POOL_MIN_JOBS else None
+    if pool is None:
+        return _run_chunk(kind, template_path, signature_img_path, stamp_img_path, jobs)
+
+    size = max(RENDER_POOL_CHUNK_SIZE, 1)
+    futures = [pool.submit(_run_chunk, kind, template_path, signature_img_path, stamp_img_path,
+                           jobs[start:start + size])
+               for start in range(0, len(jobs), size)]
+    results = []
+    for start, future in zip(range(0, len(jobs), size), futures):
+        try:
+            results.extend(future.result())
+        except Exception as e:
+            # The worker died (e.g. crashed inside MuPDF); report the whole chunk
+            results.extend({"cert_id": job[0], "output_path": None, "error": f"Render worker failed: {e}",
+                            "ms": 0.0} for job in jobs[start:start + size])
+    return results
+
+
+def render_many(template_path: str, jobs: list,
+                signature_img_path: str | None = None, stamp_img_path: str | None = None) -> list:
+    """
+    Render (cert_id, field_values, output_path) jobs. Returns one result dict
+    per job, in order, with the layout manifest to store on the certificate.
+    """
+    return _run("render", template_path, signature_img_path, stamp_img_path, jobs)
+
+
+def sign_many(template_path: str, jobs: list,
+              signature_img_path: str | None, stamp_img_path: str | None) -> list:
+    """
+    Overlay signature/stamp images on (cert_id, pdf_path, output_path, layout)
+    jobs; layout is the certificate's stored manifest, or None to locate the
+    slots on the current template. Returns one result dict per job, in order.
+    """
+    return _run("sign", template_path, signature_img_path, stamp_img_path, jobs)
+
+
+def summarize(results: list) -> dict:
+    """Counts and per-certificate latency (ms) of a render_many/sign_many run."""
+    latencies = sorted(r["ms"] for r in results if r["error"] is None)
+
+    def percentile(p: float):
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+    return {
+        "count": len(results),
+        "failed": sum(1 for r in results if r["error"] is not None),
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "max_ms": latencies[-1] if latencies else None,
+    }
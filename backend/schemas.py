@@ -1,5 +1,5 @@
 from pydantic import BaseModel, field_validator, EmailStr
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 
 class UserBase(BaseModel):
@@ -98,3 +98,16 @@ class VerificationRequest(BaseModel):
     certificate_id: Optional[str] = None
     data_payload: Optional[Dict[str, Any]] = None
     signature: Optional[str] = None
+
+VERIFY_BATCH_MAX = 1000
+
+class BatchVerificationRequest(BaseModel):
+    certificate_ids: List[str] = []
+    documents: List[Dict[str, Any]] = []
+
+    @field_validator("certificate_ids", "documents")
+    @classmethod
+    def batch_size_limit(cls, v: list) -> list:
+        if len(v) > VERIFY_BATCH_MAX:
+            raise ValueError(f"At most {VERIFY_BATCH_MAX} items can be verified per request")
+        return v
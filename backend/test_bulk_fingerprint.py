@@ -0,0 +1,39 @@
+import bulk_mapping
+
+HEADERS = ["student_name", "student_id", "course_name", "cert_type"]
+
+
+def fingerprints(rows):
+    plan = bulk_mapping.MappingPlan(HEADERS, {"student_name", "course_name"})
+    entries, rejected = plan.apply(rows, 2)
+    assert not rejected, rejected
+    return [entry["fingerprint"] for entry in entries]
+
+
+def test_same_name_and_course_different_student_id():
+    a, b = fingerprints([
+        {"student_name": "John Smith", "student_id": "1", "course_name": "Math", "cert_type": "certificate"},
+        {"student_name": "John Smith", "student_id": "2", "course_name": "Math", "cert_type": "certificate"},
+    ])
+    assert a != b
+
+
+def test_same_student_different_cert_type():
+    a, b = fingerprints([
+        {"student_name": "John Smith", "student_id": "1", "course_name": "Math", "cert_type": "certificate"},
+        {"student_name": "John Smith", "student_id": "1", "course_name": "Math", "cert_type": "transcript"},
+    ])
+    assert a != b
+
+
+def test_repeated_row_keeps_its_fingerprint():
+    row = {"student_name": "John Smith", "student_id": " 1 ", "course_name": "Math", "cert_type": ""}
+    a, b = fingerprints([row, dict(row, student_id="1", cert_type="certificate")])
+    assert a == b
+
+
+if __name__ == "__main__":
+    test_same_name_and_course_different_student_id()
+    test_same_student_different_cert_type()
+    test_repeated_row_keeps_its_fingerprint()
+    print("bulk fingerprint tests passed")
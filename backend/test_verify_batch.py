@@ -0,0 +1,50 @@
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test_verify_batch.db")
+
+from fastapi.testclient import TestClient
+
+import main
+
+client = TestClient(main.app)
+
+
+def valid_document() -> dict:
+    issued = client.post("/api/issue", json={"student_name": "Batch Tester", "course_name": "Verification 101",
+                                               "data_payload": {}})
+    assert issued.status_code == 200, issued.text
+    return issued.json()["data_payload"]
+
+
+def test_mixed_valid_and_malformed_batch():
+    doc = valid_document()
+    malformed = [
+        {**doc, "signature": {**doc["signature"], "targetHash": {"not": "a string"}}},
+        {**doc, "signature": {**doc["signature"], "merkleRoot": ["a", "list"]}},
+        {**doc, "signature": "a string"},
+        {**doc, "signature": {**doc["signature"], "signature": 42}},
+    ]
+    response = client.post("/api/verify/batch", json={"certificate_ids": ["no-such-certificate"],
+                                                       "documents": [doc] + malformed})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["summary"]["total"] == 6
+    assert body["summary"]["not_found"] == 1
+    assert body["summary"]["malformed"] == 4
+    not_found, checked, *rest = body["results"]
+    assert not_found["valid"] is False and not_found["error"] == "Certificate not found"
+    assert checked["summary"]["documentIntegrity"] is True
+    assert checked["valid"] is checked["summary"]["all"]
+    for result in rest:
+        assert result["valid"] is False and result["error"].startswith("Malformed document")
+
+
+def test_single_malformed_document_is_rejected():
+    response = client.post("/api/verify", json={"data_payload": {"signature": "a string"}})
+    assert response.status_code == 400, response.text
+
+
+if __name__ == "__main__":
+    test_mixed_valid_and_malformed_batch()
+    test_single_malformed_document_is_rejected()
+    print("batch verification tests passed")
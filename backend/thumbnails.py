@@ -0,0 +1,139 @@
+"""
+thumbnails.py
+─────────────────────────────────────────────────────────────────────
+Low-resolution previews of certificate PDFs for listing pages.
+
+Page one of a PDF is rasterized at THUMBNAIL_DPI and written next to
+it as <name>.thumb<dpi>.<format>, so changing the DPI or format never
+serves an old file. A thumbnail older than its PDF (re-signed since)
+is made again. submit() generates thumbnails on a background thread,
+e.g. right after issuance, so the first listing finds them ready.
+
+Configuration (environment):
+  THUMBNAIL_DPI       rasterization resolution (default: 48)
+  THUMBNAIL_FORMAT    webp | png | jpeg (default: webp)
+  THUMBNAIL_QUALITY   webp / jpeg quality (default: 75)
+  THUMBNAILS_ON_ISSUE generate thumbnails in the background after issuance and signing (default: 1)
+"""
+
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import fitz  # PyMuPDF
+
+THUMBNAIL_DPI = int(os.getenv("THUMBNAIL_DPI", "48"))
+THUMBNAIL_FORMAT = os.getenv("THUMBNAIL_FORMAT", "webp").lower()
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "75"))
+THUMBNAILS_ON_ISSUE = os.getenv("THUMBNAILS_ON_ISSUE", "1") == "1"
+
+MEDIA_TYPES = {"webp": "image/webp", "png": "image/png", "jpeg": "image/jpeg"}
+if THUMBNAIL_FORMAT not in MEDIA_TYPES:
+    raise ValueError(f"THUMBNAIL_FORMAT must be one of {', '.join(MEDIA_TYPES)}")
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def media_type() -> str:
+    return MEDIA_TYPES[THUMBNAIL_FORMAT]
+
+
+def thumbnail_path(pdf_path: str) -> str:
+    """Where the thumbnail of pdf_path is stored."""
+    base, _ = os.path.splitext(pdf_path)
+    return f"{base}.thumb{THUMBNAIL_DPI}.{THUMBNAIL_FORMAT}"
+
+
+def _encode(pix: fitz.Pixmap) -> bytes:
+    if THUMBNAIL_FORMAT == "png":
+        return pix.tobytes("png")
+    if THUMBNAIL_FORMAT == "jpeg":
+        return pix.tobytes("jpg", jpg_quality=THUMBNAIL_QUALITY)
+    # PyMuPDF has no WebP encoder of its own; Pillow is already a dependency
+    return pix.pil_tobytes(format="WEBP", quality=THUMBNAIL_QUALITY)
+
+
+def render_thumbnail(pdf) -> bytes:
+    """Page one of pdf (a file path or PDF bytes) as THUMBNAIL_FORMAT bytes."""
+    doc = fitz.open(stream=pdf, filetype="pdf") if isinstance(pdf, bytes) else fitz.open(pdf)
+    try:
+        return _encode(doc[0].get_pixmap(dpi=THUMBNAIL_DPI, alpha=False))
+    finally:
+        doc.close()
+
+
+def is_current(thumb_path: str, source_mtime: float | None = None) -> bool:
+    """Whether thumb_path exists and is not older than source_mtime (None: never stale)."""
+    try:
+        return os.path.getmtime(thumb_path) >= (source_mtime or 0)
+    except FileNotFoundError:
+        return False
+
+
+def make(pdf, thumb_path: str) -> str:
+    """Write the thumbnail of pdf (a file path or PDF bytes) to thumb_path."""
+    data = render_thumbnail(pdf)
+    tmp_path = f"{thumb_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, thumb_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return thumb_path
+
+
+def get_or_make(pdf_path: str, thumb_path: str, source_mtime: float | None = None) -> str:
+    """Path of the thumbnail of pdf_path stored at thumb_path, made if not current."""
+    if is_current(thumb_path, source_mtime):
+        return thumb_path
+    return make(pdf_path, thumb_path)
+
+
+def for_pdf(pdf_path: str) -> str:
+    """Thumbnail stored next to pdf_path, made again if the PDF was rewritten since."""
+    return get_or_make(pdf_path, thumbnail_path(pdf_path), os.path.getmtime(pdf_path))
+
+
+def discard(pdf_path: str):
+    """Remove the thumbnail stored next to pdf_path, if any."""
+    try:
+        os.remove(thumbnail_path(pdf_path))
+    except OSError:
+        pass
+
+
+def _generate(pdf_paths: list):
+    failed = 0
+    for pdf_path in pdf_paths:
+        try:
+            for_pdf(pdf_path)
+        except Exception as e:
+            failed += 1
+            print(f"THUMBNAIL ERROR for {pdf_path}: {e}")
+    if failed:
+        print(f"THUMBNAILS: {failed}/{len(pdf_paths)} could not be generated")
+
+
+def submit(pdf_paths: list):
+    """Generate the thumbnails of pdf_paths in the background, if THUMBNAILS_ON_ISSUE."""
+    global _executor
+    pdf_paths = [p for p in pdf_paths if p]
+    if not (THUMBNAILS_ON_ISSUE and pdf_paths):
+        return
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="thumbnails")
+        _executor.submit(_generate, pdf_paths)
+
+
+def shutdown():
+    """Drop queued thumbnail work; listings make missing thumbnails on demand."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True, cancel_futures=True)
+            _executor = None
@@ -0,0 +1,147 @@
+"""
+verify_cache.py
+─────────────────────────────────────────────────────────────────────
+Cache of /api/verify results for certificate-id lookups (shared links,
+printed QR codes), which are verified over and over with the same answer.
+
+  • entries are keyed by certificate id and Merkle Root
+  • TTL expiry plus LRU eviction bound staleness and memory
+  • concurrent requests for the same certificate share one computation
+  • revoke_certificate drops the certificate's entry and, when its whole
+    batch is revoked, every entry anchored under the same root
+
+Only certificate-id requests are cached. A submitted OA document can be
+tampered with while keeping its id and root, so it is always re-verified.
+
+Configuration (environment):
+  VERIFY_CACHE_TTL_SECONDS   entry lifetime (default: 300)
+  VERIFY_CACHE_MAX_ENTRIES   LRU capacity (default: 10000)
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+VERIFY_CACHE_TTL_SECONDS = float(os.getenv("VERIFY_CACHE_TTL_SECONDS", "300"))
+VERIFY_CACHE_MAX_ENTRIES = int(os.getenv("VERIFY_CACHE_MAX_ENTRIES", "10000"))
+
+
+class VerificationCache:
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # (cert_id, merkle_root) -> (expires_at, result)
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._root_by_cert: dict[str, str] = {}
+        self._inflight: dict[str, Future] = {}
+        self._generation = 0  # bumped by every invalidation
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _lookup(self, cert_id: str):
+        root = self._root_by_cert.get(cert_id)
+        if root is None:
+            return None
+        key = (cert_id, root)
+        expires_at, result = self._entries[key]
+        if expires_at < time.monotonic():
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def _drop(self, key):
+        self._entries.pop(key, None)
+        if self._root_by_cert.get(key[0]) == key[1]:
+            del self._root_by_cert[key[0]]
+
+    def get_or_compute(self, cert_id: str, compute):
+        """
+        Return the cached result for cert_id, or run compute() exactly once for
+        all concurrent callers. compute returns (merkle_root, result). Exceptions
+        reach every waiting caller and are not cached.
+        """
+        with self._lock:
+            result = self._lookup(cert_id)
+            if result is not None:
+                self.hits += 1
+                return result
+            future = self._inflight.get(cert_id)
+            owner = future is None
+            if owner:
+                self.misses += 1
+                future = Future()
+                self._inflight[cert_id] = future
+                generation = self._generation
+            else:
+                self.coalesced += 1
+        if not owner:
+            return future.result()
+
+        try:
+            merkle_root, result = compute()
+        except BaseException as exc:
+            with self._lock:
+                self._inflight.pop(cert_id, None)
+            future.set_exception(exc)
+            raise
+
+        with self._lock:
+            self._inflight.pop(cert_id, None)
+            # A revocation committed while we computed may have made this result stale
+            if generation == self._generation:
+                self._store(cert_id, merkle_root, result)
+        future.set_result(result)
+        return result
+
+    def _store(self, cert_id: str, merkle_root: str, result):
+        old_root = self._root_by_cert.get(cert_id)
+        if old_root is not None:
+            self._drop((cert_id, old_root))
+        self._entries[(cert_id, merkle_root)] = (time.monotonic() + self.ttl_seconds, result)
+        self._root_by_cert[cert_id] = merkle_root
+        while len(self._entries) > self.max_entries:
+            key, _ = self._entries.popitem(last=False)
+            if self._root_by_cert.get(key[0]) == key[1]:
+                del self._root_by_cert[key[0]]
+            self.evictions += 1
+
+    def invalidate_certificate(self, cert_id: str):
+        with self._lock:
+            self._generation += 1
+            root = self._root_by_cert.get(cert_id)
+            if root is not None:
+                self._drop((cert_id, root))
+                self.invalidations += 1
+
+    def invalidate_root(self, merkle_root: str):
+        with self._lock:
+            self._generation += 1
+            stale = [key for key in self._entries if key[1] == merkle_root]
+            for key in stale:
+                self._drop(key)
+            self.invalidations += len(stale)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+cache = VerificationCache(VERIFY_CACHE_TTL_SECONDS, VERIFY_CACHE_MAX_ENTRIES)
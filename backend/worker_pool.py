@@ -0,0 +1,120 @@
+"""
+worker_pool.py
+─────────────────────────────────────────────────────────────────────
+Process pool for the CPU-bound OA work of bulk issuance and batch verification.
+
+  wrap_many(documents) → salts and hashes rows in worker processes,
+                         sent in chunks, results returned in input order
+  verify_many(triples) → Ed25519 checks of (merkle_root, signature, key_id)
+                         triples that are not memoized yet
+
+Signing is not part of the per-row work: a bulk upload is anchored as one
+batch (see bulk_issue.py), so its single root is signed in the caller.
+Small jobs run inline, because a process round trip costs more than they do.
+
+Configuration (environment):
+  WRAP_POOL_WORKERS     number of worker processes (default: CPU count, 0/1 = inline only)
+  WRAP_POOL_CHUNK_SIZE  rows sent to a worker per task (default: 256)
+  WRAP_POOL_MIN_ROWS    smallest job worth sending to the pool (default: 512)
+  VERIFY_POOL_MIN_PAIRS smallest signature batch worth sending to the pool (default: 64)
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Workers import this module to run their tasks, so the issuer key is loaded
+# once per worker process through crypto_utils, not once per task.
+import crypto_utils
+import oa_logic
+
+WRAP_POOL_WORKERS = int(os.getenv("WRAP_POOL_WORKERS", str(os.cpu_count() or 1)))
+WRAP_POOL_CHUNK_SIZE = int(os.getenv("WRAP_POOL_CHUNK_SIZE", "256"))
+WRAP_POOL_MIN_ROWS = int(os.getenv("WRAP_POOL_MIN_ROWS", "512"))
+VERIFY_POOL_MIN_PAIRS = int(os.getenv("VERIFY_POOL_MIN_PAIRS", "64"))
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ProcessPoolExecutor | None:
+    """Shared executor, started lazily. None when the pool is disabled."""
+    global _pool
+    if WRAP_POOL_WORKERS <= 1:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a server process that already runs threads is not safe
+            _pool = ProcessPoolExecutor(
+                max_workers=WRAP_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+def wrap_many(documents: list) -> tuple[list, list]:
+    """
+    Salt and hash (data, issuers) pairs. Returns (salted_docs, target_hashes),
+    both in input order.
+    """
+    pool = get_pool() if len(documents) >= WRAP_POOL_MIN_ROWS else None
+    datas = [data for data, _ in documents]
+    issuers = [iss for _, iss in documents]
+    if pool is None:
+        results = map(oa_logic.salt_and_hash_document, datas, issuers)
+    else:
+        results = pool.map(oa_logic.salt_and_hash_document, datas, issuers, chunksize=WRAP_POOL_CHUNK_SIZE)
+
+    salted_docs, target_hashes = [], []
+    for salted_data, target_hash in results:
+        salted_docs.append(salted_data)
+        target_hashes.append(target_hash)
+    return salted_docs, target_hashes
+
+
+
+def _verify_triple(merkle_root: str, signature_b64: str, key_id: str) -> bool:
+    return crypto_utils.verify_signature(merkle_root, signature_b64, key_id)
+
+
+def verify_many(triples: list) -> dict:
+    """
+    Check (merkle_root, signature, key_id) triples. Memoized triples are
+    answered from crypto_utils; the rest are verified (across the pool for
+    large batches) and recorded there. Returns {(root, signature, key_id): bool}.
+    """
+    results = {}
+    pending = []
+    for root, sig, key_id in dict.fromkeys(triples):
+        if not isinstance(root, str) or not isinstance(sig, str):
+            results[(root, sig, key_id)] = False
+            continue
+        cached = crypto_utils.cached_root_signature(root, sig, key_id)
+        if cached is None:
+            pending.append((root, sig, key_id))
+        else:
+            results[(root, sig, key_id)] = cached
+
+    pool = get_pool() if len(pending) >= VERIFY_POOL_MIN_PAIRS else None
+    roots = [root for root, _, _ in pending]
+    sigs = [sig for _, sig, _ in pending]
+    key_ids = [key_id for _, _, key_id in pending]
+    if pool is None:
+        checked = map(_verify_triple, roots, sigs, key_ids)
+    else:
+        checked = pool.map(_verify_triple, roots, sigs, key_ids,
+                           chunksize=max(1, len(pending) // (WRAP_POOL_WORKERS * 4)))
+
+    for triple, valid in zip(pending, checked):
+        crypto_utils.remember_root_signature(*triple, valid)
+        results[triple] = valid
+    return results
@@ -7,6 +7,7 @@ import { FileText, Download, ShieldCheck, Calendar, Award, ExternalLink, Loader2
 import axios from "axios"
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card"
 import { Button } from "@/components/ui/button"
+import CertificateThumbnail from "@/components/CertificateThumbnail"
 
 interface Certificate {
     id: string
@@ -83,6 +84,11 @@ export default function CertificatesPage() {
                             key={cert.id}
                             className={`group relative p-6 rounded-2xl border transition-all hover:shadow-xl ${cert.revoked ? "bg-slate-50 border-red-200 grayscale shadow-sm" : "bg-white border-slate-200 hover:border-indigo-500/50 shadow-sm"}`}
                         >
+                            <CertificateThumbnail
+                                certId={cert.id}
+                                className="w-full h-40 object-contain bg-slate-50 rounded-xl border border-slate-100 mb-6"
+                                fallback={null}
+                            />
                             <div className="flex justify-between items-start mb-6">
                                 <div className={`p-3 rounded-xl shadow-sm ${cert.revoked ? "bg-red-100" : "bg-indigo-50"}`}>
                                     <FileText className={`w-6 h-6 ${cert.revoked ? "text-red-500" : "text-indigo-600"}`} />
@@ -196,6 +196,7 @@ export default function IssuePage() {
     // ── Global feedback
     const [loading, setLoading] = useState(false)
     const [error, setError] = useState("")
+    const [notice, setNotice] = useState("")
 
     // ── Step 1: Template
     const [parsedTemplate, setParsedTemplate] = useState<ParsedTemplate | null>(null)
@@ -260,7 +261,7 @@ export default function IssuePage() {
             return
         }
 
-        setLoading(true); setError("")
+        setLoading(true); setError(""); setNotice("")
         try {
             // For PDF templates: use bulk-issue-excel with a synthetic single row via the API
             // For HTML: use the existing /api/issue endpoint  
@@ -273,7 +274,17 @@ export default function IssuePage() {
                 const csvFile = new File([csvBlob], "single.csv")
                 const fd = new FormData(); fd.append("file", csvFile)
                 const res = await axios.post(`${API}/api/templates/bulk-issue-excel`, fd, { withCredentials: true })
-                const certs: IssuedCert[] = (res.data.certificates || []).map((c: IssuedCert) => ({ ...c, signing_status: "unsigned" }))
+                const issued: IssuedCert[] = (res.data.certificates || []).map((c: IssuedCert) => ({ ...c, signing_status: "unsigned" }))
+                // The same row issued earlier is not issued again: carry on with that certificate
+                const existing: IssuedCert[] = res.data.skipped_certificates || []
+                const certs = [...issued, ...existing]
+                if (certs.length === 0) {
+                    setError(res.data.errors?.[0]?.errors?.join(" ") || "The certificate was not issued")
+                    return
+                }
+                if (existing.length > 0) {
+                    setNotice(`${sName} already holds this certificate; it was not issued again.`)
+                }
                 setIssuedCerts(certs)
                 setSelectedCertIds(new Set(certs.map((c: IssuedCert) => c.id)))
             } else {
@@ -296,7 +307,7 @@ export default function IssuePage() {
 
     const handleBulkIssue = async () => {
         if (!bulkFile) return
-        setLoading(true); setError("")
+        setLoading(true); setError(""); setNotice("")
         try {
             const fd = new FormData(); fd.append("file", bulkFile)
             const endpoint = bulkFile.name.endsWith(".xlsx")
@@ -304,6 +315,9 @@ export default function IssuePage() {
                 : `${API}/api/templates/bulk-issue`
             const res = await axios.post(endpoint, fd, { withCredentials: true })
             const certs: IssuedCert[] = (res.data.certificates || []).map((c: IssuedCert) => ({ ...c, signing_status: "unsigned" }))
+            if (res.data.skipped > 0) {
+                setNotice(`${res.data.skipped} row(s) were already issued by an earlier upload and were skipped.`)
+            }
             setIssuedCerts(certs)
             setSelectedCertIds(new Set(certs.map((c: IssuedCert) => c.id)))
             setBulkFile(null)
@@ -399,13 +413,21 @@ export default function IssuePage() {
             {/* ── Global error / success ── */}
             <AnimatePresence>
                 {error && (
-                    <motion.div initial={{ opacity: 0 }} animate={{ opacity: 1 }} exit={{ opacity: 0 }}
+                    <motion.div key="error" initial={{ opacity: 0 }} animate={{ opacity: 1 }} exit={{ opacity: 0 }}
                         className="p-4 rounded-xl bg-red-50 border border-red-200 flex items-start gap-3">
                         <AlertCircle className="w-4 h-4 text-red-500 mt-0.5 shrink-0" />
                         <p className="text-sm text-red-700 font-medium flex-1">{error}</p>
                         <button onClick={() => setError("")}><X className="w-4 h-4 text-red-400 hover:text-red-600" /></button>
                     </motion.div>
                 )}
+                {notice && (
+                    <motion.div key="notice" initial={{ opacity: 0 }} animate={{ opacity: 1 }} exit={{ opacity: 0 }}
+                        className="p-4 rounded-xl bg-amber-50 border border-amber-200 flex items-start gap-3">
+                        <AlertCircle className="w-4 h-4 text-amber-500 mt-0.5 shrink-0" />
+                        <p className="text-sm text-amber-700 font-medium flex-1">{notice}</p>
+                        <button onClick={() => setNotice("")}><X className="w-4 h-4 text-amber-400 hover:text-amber-600" /></button>
+                    </motion.div>
+                )}
             </AnimatePresence>
 
             {/* ══════════════════════════════════════════════════════════════
@@ -645,7 +667,7 @@ export default function IssuePage() {
                             <h3 className="text-base font-bold text-emerald-800">{issuedCerts.length} Certificate{issuedCerts.length !== 1 ? "s" : ""} Generated</h3>
                             <p className="text-sm text-emerald-600 mt-0.5">Now apply your digital signature and/or official stamp to finalize them.</p>
                         </div>
-                        <button onClick={() => { setStep(1); setIssuedCerts([]); setSignedResults([]) }}
+                        <button onClick={() => { setStep(1); setIssuedCerts([]); setSignedResults([]); setNotice("") }}
                             className="text-xs font-semibold text-emerald-600 hover:text-emerald-800 flex items-center gap-1">
                             <RefreshCw className="w-3.5 h-3.5" /> Start Over
                         </button>
@@ -8,6 +8,7 @@ import axios from "axios"
 import Link from "next/link"
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card"
 import { Button } from "@/components/ui/button"
+import CertificateThumbnail from "@/components/CertificateThumbnail"
 
 interface Certificate {
     id: string
@@ -132,9 +133,15 @@ export default function StudentPortal() {
                                     >
                                         <div className="flex flex-col md:flex-row md:items-center justify-between gap-6">
                                             <div className="flex items-center gap-5">
-                                                <div className="w-14 h-14 bg-indigo-50 rounded-2xl flex items-center justify-center border border-indigo-100 group-hover:scale-105 transition-transform">
-                                                    <Award className="w-8 h-8 text-indigo-600" />
-                                                </div>
+                                                <CertificateThumbnail
+                                                    certId={cert.id}
+                                                    className="w-20 h-14 object-cover bg-slate-50 rounded-2xl border border-indigo-100 group-hover:scale-105 transition-transform"
+                                                    fallback={
+                                                        <div className="w-14 h-14 bg-indigo-50 rounded-2xl flex items-center justify-center border border-indigo-100 group-hover:scale-105 transition-transform">
+                                                            <Award className="w-8 h-8 text-indigo-600" />
+                                                        </div>
+                                                    }
+                                                />
                                                 <div>
                                                     <h4 className="text-xl font-bold text-slate-900">{cert.course_name}</h4>
                                                     <div className="flex items-center gap-4 mt-1">
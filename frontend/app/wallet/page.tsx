@@ -27,6 +27,7 @@ import axios from "axios"
 import { Button } from "@/components/ui/button"
 import { Card, CardContent, CardHeader, CardTitle, CardDescription } from "@/components/ui/card"
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs"
+import CertificateThumbnail from "@/components/CertificateThumbnail"
 
 interface Certificate {
     id: string
@@ -99,7 +100,9 @@ export default function WalletPage() {
         try {
             // Find cert by ID (simulating QR scan of ID)
             const id = scanInput.includes("/") ? scanInput.split("/").pop() : scanInput
-            const res = await axios.get(`http://localhost:8000/api/download/${id}`)
+            // The thumbnail is a few KB, where the PDF would be rendered and downloaded in full;
+            // it is also the preview the details sheet shows next
+            await axios.get(`http://localhost:8000/api/thumbnail/${id}`, { responseType: "blob" })
 
             // In a real scan, we'd get the cert data. Here we simulate getting the metadata
             // Let's assume we find it in our certificates list or fetch its info
@@ -213,9 +216,15 @@ export default function WalletPage() {
                                         className="bg-white border border-slate-100 rounded-[2rem] p-5 shadow-lg shadow-slate-200/50 hover:shadow-xl hover:scale-[1.02] transition-all cursor-pointer group"
                                     >
                                         <div className="flex items-center gap-4">
-                                            <div className="w-12 h-12 bg-indigo-50 rounded-2xl flex items-center justify-center border border-indigo-100 group-hover:bg-indigo-600 group-hover:border-indigo-600 transition-colors">
-                                                <Award className="w-6 h-6 text-indigo-600 group-hover:text-white" />
-                                            </div>
+                                            <CertificateThumbnail
+                                                certId={cert.id}
+                                                className="w-16 h-12 object-cover bg-slate-50 rounded-2xl border border-indigo-100"
+                                                fallback={
+                                                    <div className="w-12 h-12 bg-indigo-50 rounded-2xl flex items-center justify-center border border-indigo-100 group-hover:bg-indigo-600 group-hover:border-indigo-600 transition-colors">
+                                                        <Award className="w-6 h-6 text-indigo-600 group-hover:text-white" />
+                                                    </div>
+                                                }
+                                            />
                                             <div className="flex-1">
                                                 <h4 className="font-bold text-slate-900 group-hover:text-indigo-600 transition-colors line-clamp-1">{cert.course_name}</h4>
                                                 <p className="text-[10px] text-slate-400 font-bold uppercase tracking-widest">{cert.organization}</p>
@@ -348,6 +357,12 @@ export default function WalletPage() {
                                 </button>
                             </div>
 
+                            <CertificateThumbnail
+                                certId={selectedCert.id}
+                                className="w-full max-h-56 object-contain bg-slate-50 rounded-3xl border border-slate-100 mb-8"
+                                fallback={null}
+                            />
+
                             <div className="grid grid-cols-2 gap-4 mb-8">
                                 <div className="p-4 bg-slate-50 rounded-3xl border border-slate-100">
                                     <p className="text-[10px] font-black text-slate-400 uppercase tracking-widest mb-1">Status</p>
@@ -0,0 +1,21 @@
+"use client"
+
+import { useState, type ReactNode } from "react"
+
+// Low-resolution preview of a certificate's first page. The backend serves it with an
+// ETag, so the browser revalidates its copy instead of downloading the PDF.
+export default function CertificateThumbnail({ certId, className, fallback }: { certId: string, className?: string, fallback: ReactNode }) {
+  const [failed, setFailed] = useState(false)
+
+  if (failed) return <>{fallback}</>
+
+  return (
+    <img
+      src={`http://localhost:8000/api/thumbnail/${certId}`}
+      alt="Certificate preview"
+      loading="lazy"
+      onError={() => setFailed(true)}
+      className={className}
+    />
+  )
+}